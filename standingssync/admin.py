@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 from . import tasks
 from .models import SyncedCharacter, SyncManager
@@ -13,6 +13,9 @@ class SyncedCharacterAdmin(admin.ModelAdmin):
         "_sync_ok",
         "last_sync",
         "last_error",
+        "drift_score",
+        "time_to_first_red",
+        "contacts_dropped",
         "manager",
     )
     list_filter = (
@@ -22,7 +25,7 @@ class SyncedCharacterAdmin(admin.ModelAdmin):
         "character_ownership__user",
         "manager",
     )
-    actions = ["start_sync_contacts"]
+    actions = ["start_sync_contacts", "show_sync_esi_calls"]
     list_display_links = None
 
     def _sync_ok(self, obj) -> bool:
@@ -49,12 +52,27 @@ class SyncedCharacterAdmin(admin.ModelAdmin):
 
     start_sync_contacts.short_description = "Sync selected characters"
 
+    def show_sync_esi_calls(self, request, queryset):
+        for obj in queryset:
+            plan = obj.calc_update_plan(force_sync=True)
+            if plan is None:
+                self.message_user(
+                    request, "{}: No valid token".format(obj), level=messages.WARNING
+                )
+            else:
+                self.message_user(request, "{}: {} needed".format(obj, plan))
+
+    show_sync_esi_calls.short_description = (
+        "Show ESI calls needed to sync selected characters"
+    )
+
 
 @admin.register(SyncManager)
 class SyncManagerAdmin(admin.ModelAdmin):
     list_display = (
         "alliance_name",
         "contacts_count",
+        "calls_saved_by_standing_tiers",
         "synced_characters_count",
         "user",
         "character_name",
@@ -86,6 +104,14 @@ class SyncManagerAdmin(admin.ModelAdmin):
     def contacts_count(self, obj):
         return "{:,}".format(obj.contacts.count())
 
+    def calls_saved_by_standing_tiers(self, obj):
+        calls_saved = obj.calc_calls_saved_by_standing_tiers()
+        return "{:,}".format(calls_saved) if calls_saved is not None else "-"
+
+    calls_saved_by_standing_tiers.short_description = (
+        "ESI calls saved per character by standing tiers"
+    )
+
     def synced_characters_count(self, obj):
         return "{:,}".format(obj.synced_characters.count())
 
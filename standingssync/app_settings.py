@@ -17,3 +17,57 @@ STANDINGSSYNC_WAR_TARGETS_LABEL_NAME = clean_setting(
 
 # When enabled will replace contacts of synced characters with alliance contacts
 STANDINGSSYNC_REPLACE_CONTACTS = clean_setting("STANDINGSSYNC_REPLACE_CONTACTS", True)
+
+# Max number of pages of alliance contacts to fetch concurrently from ESI
+STANDINGSSYNC_FETCH_PAGES_MAX_WORKERS = clean_setting(
+    "STANDINGSSYNC_FETCH_PAGES_MAX_WORKERS", 4
+)
+
+# Max number of retries when fetching a page of alliance contacts from ESI fails
+STANDINGSSYNC_FETCH_PAGES_MAX_RETRIES = clean_setting(
+    "STANDINGSSYNC_FETCH_PAGES_MAX_RETRIES", 3
+)
+
+# Number of versions of alliance contacts kept for each sync manager
+STANDINGSSYNC_MANAGER_VERSIONS_RETENTION = clean_setting(
+    "STANDINGSSYNC_MANAGER_VERSIONS_RETENTION", 20
+)
+
+# Minutes a replaced set of alliance contacts is kept unchanged,
+# so syncs still reading it are not affected by building the next version in it
+STANDINGSSYNC_CONTACT_SETS_GRACE_MINUTES = clean_setting(
+    "STANDINGSSYNC_CONTACT_SETS_GRACE_MINUTES", 60
+)
+
+# Standings of alliance contacts are mapped onto the closest of these tiers
+# before being written to synced characters, e.g. [-10, -5, 0, 5, 10].
+# Fewer distinct standings need fewer ESI calls. Disabled when empty.
+STANDINGSSYNC_STANDING_TIERS = clean_setting("STANDINGSSYNC_STANDING_TIERS", [])
+
+# Max number of ESI calls executed concurrently when writing contacts
+# to a synced character. Set to 1 to execute calls one after another.
+STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS = clean_setting(
+    "STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS", 1
+)
+
+# Characters with more differing contacts than this are synced after a drift audit
+STANDINGSSYNC_DRIFT_THRESHOLD = clean_setting("STANDINGSSYNC_DRIFT_THRESHOLD", 0)
+
+# Max number of contacts a character can have in EVE.
+# Contacts beyond this limit are not written to synced characters.
+STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT = clean_setting(
+    "STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT", 1024
+)
+
+# Criteria for choosing which contacts are written to a synced character
+# when they exceed the contacts limit, ordered by importance.
+# Criteria are: "war_targets", "abs_standing", "red" and "blue".
+STANDINGSSYNC_CONTACTS_PRIORITY = clean_setting(
+    "STANDINGSSYNC_CONTACTS_PRIORITY", ["war_targets", "abs_standing"]
+)
+
+# Max number of pages of older wars fetched from ESI per update of all wars,
+# until all older wars have been backfilled once. Set to 0 to disable backfilling.
+STANDINGSSYNC_WARS_BACKFILL_PAGES = clean_setting(
+    "STANDINGSSYNC_WARS_BACKFILL_PAGES", 5
+)
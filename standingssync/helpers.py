@@ -1,7 +1,46 @@
-from bravado.exception import HTTPError
+import datetime as dt
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from time import sleep
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
+from bravado.exception import (
+    BravadoConnectionError,
+    BravadoTimeoutError,
+    HTTPError,
+    HTTPNotModified,
+    HTTPServerError,
+)
+from requests.structures import CaseInsensitiveDict
+
+from django.utils.timezone import now
+from esi.errors import TokenExpiredError
+from esi.models import Token
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from . import __title__
 from .providers import esi
 
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+# base for waiting between retries of fetching an ESI page in seconds
+FETCH_RETRY_BACKOFF_SECONDS = 0.5
+
 
 def is_esi_online() -> bool:
     """Checks if the Eve servers are online. Returns True if there are, else False"""
@@ -14,3 +53,511 @@ def is_esi_online() -> bool:
         return False
 
     return True
+
+
+class TokenLease:
+    """Hands out the access token of a token for one sync run
+
+    The access token is refreshed once ahead of its expiry,
+    so it stays valid for at least the refresh margin after being handed out.
+    Thread safe.
+    """
+
+    REFRESH_MARGIN = dt.timedelta(minutes=5)
+
+    def __init__(self, token: Token) -> None:
+        self._token = token
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.refreshes = 0
+
+    def __str__(self) -> str:
+        return "{:,} access tokens handed out with {:,} refreshes".format(
+            self.requests, self.refreshes
+        )
+
+    @property
+    def requests_saved(self) -> int:
+        """number of access tokens handed out without refreshing"""
+        return self.requests - self.refreshes
+
+    def access_token(self) -> str:
+        """returns a valid access token
+
+        Raises:
+        - TokenExpiredError: when the token is expiring and can not be refreshed
+        """
+        with self._lock:
+            self.requests += 1
+            if self._token.expires - self.REFRESH_MARGIN < now():
+                if not self._token.can_refresh:
+                    raise TokenExpiredError()
+                self._token.refresh()
+                self.refreshes += 1
+            return self._token.access_token
+
+
+class ContactsHasher:
+    """Calculates a hash for a set of contacts incrementally,
+    which does not depend on the order in which contacts are added
+
+    Each contact is hashed on its own and the hashes are summed up,
+    so no contacts need to be kept in memory.
+    """
+
+    _MODULUS = 2 ** 128
+
+    def __init__(self) -> None:
+        self._total = 0
+        self._count = 0
+
+    def update(self, contact_id: int, standing: float, is_war_target: bool) -> None:
+        """adds a contact to the hash"""
+        value = f"{int(contact_id)}:{float(standing) + 0.0:.2f}:{bool(is_war_target):d}"
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        self._total = (self._total + int.from_bytes(digest, "big")) % self._MODULUS
+        self._count += 1
+
+    def hexdigest(self) -> str:
+        """returns the hash of all added contacts as hex string with 32 characters"""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(self._total.to_bytes(16, "big"))
+        hasher.update(self._count.to_bytes(8, "big"))
+        return hasher.hexdigest()
+
+
+def calc_contacts_hash(contacts: Iterable[Tuple[int, float, bool]]) -> str:
+    """Calculates a hash for a set of contacts, which does not depend on their order
+
+    Args:
+    - contacts: tuples of contact ID, standing and whether it is a war target
+
+    Returns:
+    - hash as hex string with 32 characters
+    """
+    hasher = ContactsHasher()
+    for contact_id, standing, is_war_target in contacts:
+        hasher.update(contact_id, standing, is_war_target)
+    return hasher.hexdigest()
+
+
+def quantize_standing(standing: float, tiers: Iterable[float]) -> float:
+    """returns the tier closest to a standing
+    or the standing itself if there are no tiers
+
+    When a standing is exactly between two tiers the tier closer to neutral wins.
+    """
+    tiers = list(tiers)
+    if not tiers:
+        return standing
+    return float(min(tiers, key=lambda tier: (abs(tier - standing), abs(tier))))
+
+
+CONTACT_PRIORITIES = {
+    "war_targets": lambda standing, is_war_target: not is_war_target,
+    "abs_standing": lambda standing, is_war_target: -abs(standing),
+    "red": lambda standing, is_war_target: standing,
+    "blue": lambda standing, is_war_target: -standing,
+}
+"""criteria for prioritizing contacts, each returns a sort key"""
+
+
+def select_contacts(
+    contacts: Dict[int, Tuple[float, bool]], limit: int, priority: Iterable[str]
+) -> Dict[int, Tuple[float, bool]]:
+    """returns the contacts with the highest priority up to the limit
+
+    Args:
+    - contacts: standing and war target flag by contact ID
+    - limit: max number of contacts to return
+    - priority: names of criteria from CONTACT_PRIORITIES by importance.
+    Ties are broken by contact ID.
+    """
+    if len(contacts) <= limit:
+        return dict(contacts)
+    try:
+        key_funcs = [CONTACT_PRIORITIES[name] for name in priority]
+    except KeyError as ex:
+        raise ValueError(f"Unknown contact priority: {ex}") from None
+
+    def sort_key(item):
+        contact_id, (standing, is_war_target) = item
+        keys = [func(standing, is_war_target) for func in key_funcs]
+        return (*keys, contact_id)
+
+    selected = sorted(contacts.items(), key=sort_key)[: max(limit, 0)]
+    return dict(selected)
+
+
+def run_concurrently(func: Callable, items: Iterable, max_workers: int = 1) -> list:
+    """Calls func for each item with a bounded pool of threads
+
+    Returns:
+    - results in the order of items. Re-raises the first exception of any call.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def iter_batches(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yields successive lists with up to size items from any iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ContactChanges(NamedTuple):
+    """Changes of contacts between two versions"""
+
+    added_ids: Set[int]
+    removed_ids: Set[int]
+    changed_ids: Set[int]
+
+    @classmethod
+    def create_empty(cls) -> "ContactChanges":
+        return cls(added_ids=set(), removed_ids=set(), changed_ids=set())
+
+    def merge(self, later: "ContactChanges") -> "ContactChanges":
+        """returns the combined changes of this and a later change"""
+        added_ids = set(self.added_ids)
+        removed_ids = set(self.removed_ids)
+        changed_ids = set(self.changed_ids)
+        for contact_id in later.added_ids:
+            if contact_id in removed_ids:
+                removed_ids.remove(contact_id)
+                changed_ids.add(contact_id)
+            else:
+                added_ids.add(contact_id)
+
+        for contact_id in later.removed_ids:
+            if contact_id in added_ids:
+                added_ids.remove(contact_id)
+            else:
+                changed_ids.discard(contact_id)
+                removed_ids.add(contact_id)
+
+        for contact_id in later.changed_ids:
+            if contact_id not in added_ids:
+                changed_ids.add(contact_id)
+
+        return ContactChanges(
+            added_ids=added_ids, removed_ids=removed_ids, changed_ids=changed_ids
+        )
+
+
+def fetch_esi_page(
+    esi_method: Callable,
+    page: int,
+    etag: str = None,
+    max_retries: int = 0,
+    **kwargs,
+) -> Tuple[Optional[list], CaseInsensitiveDict]:
+    """Fetches one page from a paged ESI endpoint with a conditional request
+
+    Args:
+    - esi_method: method of the ESI client for the endpoint
+    - page: number of the page to fetch
+    - etag: ETag from the last fetch of this page if any
+    - max_retries: how often to retry on server and connection errors
+    - kwargs: parameters for the endpoint
+
+    Returns:
+    - data and headers of the page. data is None if the page is unchanged.
+    """
+    retries = 0
+    while True:
+        try:
+            return fetch_esi_with_etag(esi_method, etag, page=page, **kwargs)
+        except (HTTPServerError, BravadoConnectionError, BravadoTimeoutError):
+            if retries >= max_retries:
+                raise
+            retries += 1
+            logger.warning(
+                "Failed to fetch page %d (Retry: %d/%d)",
+                page,
+                retries,
+                max_retries,
+                exc_info=True,
+            )
+            sleep(FETCH_RETRY_BACKOFF_SECONDS * 2 ** (retries - 1))
+
+
+def fetch_esi_with_etag(
+    esi_method: Callable, etag: str = None, **kwargs
+) -> Tuple[Optional[Any], CaseInsensitiveDict]:
+    """Fetches data from an ESI endpoint with a conditional request
+
+    Args:
+    - esi_method: method of the ESI client for the endpoint
+    - etag: ETag from the last fetch if any
+    - kwargs: parameters for the endpoint
+
+    Returns:
+    - data and headers of the response. data is None if it is unchanged.
+    """
+    request_options = {"headers": {"If-None-Match": etag}} if etag else {}
+    operation = esi_method(_request_options=request_options, **kwargs)
+    operation.request_config.also_return_response = True
+    try:
+        data, response = operation.result()
+    except HTTPNotModified as ex:
+        return None, CaseInsensitiveDict(getattr(ex.response, "headers", None) or {})
+
+    headers = CaseInsensitiveDict(response.headers)
+    if etag and headers.get("ETag") == etag:
+        # response is from the cache, but has not changed either
+        return None, headers
+    return data, headers
+
+
+def fetch_esi_pages_with_etags(
+    esi_method: Callable,
+    etags: List[Optional[str]],
+    max_workers: int = 1,
+    max_retries: int = 0,
+    **kwargs,
+) -> Tuple[Optional[list], List[Optional[str]]]:
+    """Fetches all pages from a paged ESI endpoint with conditional requests
+
+    The first page is fetched alone to learn the number of pages from X-Pages.
+    All other pages are then fetched concurrently.
+
+    Args:
+    - esi_method: method of the ESI client for the endpoint
+    - etags: ETags from the last fetch of all pages
+    - max_workers: max number of pages to fetch concurrently
+    - max_retries: how often to retry fetching a page on server and connection errors
+    - kwargs: parameters for the endpoint
+
+    Returns:
+    - data of all pages and the current ETags of all pages.
+      data is None if all pages are unchanged.
+    """
+
+    def fetch_pages(etags_by_page: Dict[int, Optional[str]]) -> dict:
+        return _fetch_esi_pages_concurrently(
+            esi_method, etags_by_page, max_workers, max_retries, **kwargs
+        )
+
+    old_etags = dict(enumerate(etags, start=1))
+    responses = fetch_pages({1: old_etags.get(1)})
+    data, headers = responses[1]
+    if data is None and "X-Pages" not in headers:
+        total_pages = len(etags)
+    else:
+        total_pages = int(headers.get("X-Pages", 1))
+    responses.update(
+        fetch_pages({page: old_etags.get(page) for page in range(2, total_pages + 1)})
+    )
+    unchanged_pages = [page for page, (data, _) in responses.items() if data is None]
+    if len(unchanged_pages) == total_pages == len(etags):
+        return None, list(etags)
+
+    responses.update(fetch_pages({page: None for page in unchanged_pages}))
+    results = list()
+    new_etags = list()
+    for page in sorted(responses):
+        data, headers = responses.pop(page)
+        results += data
+        new_etags.append(headers.get("ETag"))
+    return results, new_etags
+
+
+def _fetch_esi_pages_concurrently(
+    esi_method: Callable,
+    etags_by_page: Dict[int, Optional[str]],
+    max_workers: int,
+    max_retries: int,
+    **kwargs,
+) -> Dict[int, Tuple[Optional[list], CaseInsensitiveDict]]:
+    """fetches the given pages with a bounded pool of threads
+
+    Returns:
+    - data and headers by page
+    """
+    if max_workers <= 1 or len(etags_by_page) <= 1:
+        return {
+            page: fetch_esi_page(esi_method, page, etag, max_retries, **kwargs)
+            for page, etag in etags_by_page.items()
+        }
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(etags_by_page))
+    ) as executor:
+        futures = {
+            page: executor.submit(
+                fetch_esi_page, esi_method, page, etag, max_retries, **kwargs
+            )
+            for page, etag in etags_by_page.items()
+        }
+        return {page: future.result() for page, future in futures.items()}
+
+
+class EsiContactsCall(NamedTuple):
+    """A call to ESI for changing contacts of a character"""
+
+    action: str
+    contact_ids: Tuple[int, ...]
+    standing: Optional[float] = None
+    label_ids: Tuple[int, ...] = ()
+
+    def to_dict(self) -> dict:
+        """returns this call as JSON serializable dict"""
+        return {
+            "action": self.action,
+            "contact_ids": list(self.contact_ids),
+            "standing": self.standing,
+            "label_ids": list(self.label_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EsiContactsCall":
+        return cls(
+            action=data["action"],
+            contact_ids=tuple(data["contact_ids"]),
+            standing=data.get("standing"),
+            label_ids=tuple(data.get("label_ids", ())),
+        )
+
+
+class EsiContactsPlan:
+    """A plan with the minimal number of ESI calls for changing contacts
+    of a character
+
+    Contacts are deleted first. Then contacts are added and updated
+    in the order of their importance for the safety of pilots:
+    war targets first, then by standing from red to blue.
+    All contacts written with the same call have the same standing and labels.
+    """
+
+    DELETE = "delete"
+    POST = "post"
+    PUT = "put"
+
+    # max number of contact IDs ESI accepts per call
+    MAX_IDS_PER_DELETE = 20
+    MAX_IDS_PER_WRITE = 100
+
+    def __init__(
+        self,
+        ids_to_delete: Iterable[int] = None,
+        contacts_to_add: Iterable[Tuple[int, float, Optional[int]]] = None,
+        contacts_to_update: Iterable[Tuple[int, float, Optional[int]]] = None,
+    ) -> None:
+        """
+        Args:
+        - ids_to_delete: IDs of contacts to delete
+        - contacts_to_add: tuples of contact ID, standing and optional label ID
+        - contacts_to_update: tuples of contact ID, standing and optional label ID
+        """
+        self.calls = [
+            EsiContactsCall(action=self.DELETE, contact_ids=tuple(contact_ids))
+            for contact_ids in iter_batches(
+                sorted(set(ids_to_delete or [])), self.MAX_IDS_PER_DELETE
+            )
+        ]
+        writes = self._plan_writes(self.POST, contacts_to_add or [])
+        writes += self._plan_writes(self.PUT, contacts_to_update or [])
+        self.calls += sorted(writes, key=self._write_priority)
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    @classmethod
+    def from_calls(cls, calls: Iterable[EsiContactsCall]) -> "EsiContactsPlan":
+        """creates a plan from already planned calls, e.g. to resume a plan"""
+        plan = cls()
+        plan.calls = list(calls)
+        return plan
+
+    def __str__(self) -> str:
+        counts = self.count_by_action()
+        return "{:,} calls ({:,} delete, {:,} post, {:,} put)".format(
+            len(self), counts[self.DELETE], counts[self.POST], counts[self.PUT]
+        )
+
+    def apply(self, contacts: Dict[int, dict]) -> Dict[int, dict]:
+        """returns contacts as they are expected to be after executing this plan
+
+        Args:
+        - contacts: contacts by contact ID with standing and label IDs like from ESI
+        """
+        new_contacts = {
+            contact_id: dict(contact) for contact_id, contact in contacts.items()
+        }
+        for call in self.calls:
+            for contact_id in call.contact_ids:
+                if call.action == self.DELETE:
+                    new_contacts.pop(contact_id, None)
+                elif call.action == self.POST or contact_id not in new_contacts:
+                    new_contacts[contact_id] = {
+                        "contact_id": contact_id,
+                        "standing": call.standing,
+                        "label_ids": list(call.label_ids) or None,
+                    }
+                else:
+                    contact = new_contacts[contact_id]
+                    contact["standing"] = call.standing
+                    if call.label_ids:
+                        contact["label_ids"] = sorted(
+                            set(contact.get("label_ids") or []) | set(call.label_ids)
+                        )
+        return new_contacts
+
+    def count_contacts(self) -> int:
+        """returns the number of contacts changed by this plan
+
+        Contacts which are deleted and re-added are counted twice.
+        """
+        return sum(len(call.contact_ids) for call in self.calls)
+
+    def stages(self) -> List[List[EsiContactsCall]]:
+        """returns the calls in stages, which need to be executed one after another
+
+        All calls within a stage are independent and can be executed concurrently:
+        Deletes have disjoint IDs and must be completed before contacts are
+        (re-)added. Posts and puts are for disjoint IDs too.
+        """
+        deletes = [call for call in self.calls if call.action == self.DELETE]
+        writes = [call for call in self.calls if call.action != self.DELETE]
+        return [stage for stage in (deletes, writes) if stage]
+
+    def count_by_action(self) -> Dict[str, int]:
+        """returns the number of calls for each action"""
+        counts = {self.DELETE: 0, self.POST: 0, self.PUT: 0}
+        for call in self.calls:
+            counts[call.action] += 1
+        return counts
+
+    @staticmethod
+    def _write_priority(call: EsiContactsCall) -> tuple:
+        # only war targets have labels
+        return (not call.label_ids, call.standing)
+
+    @classmethod
+    def _plan_writes(
+        cls, action: str, contacts: Iterable[Tuple[int, float, Optional[int]]]
+    ) -> List[EsiContactsCall]:
+        contact_ids_by_group = dict()
+        for contact_id, standing, label_id in contacts:
+            group = (float(standing), (label_id,) if label_id else ())
+            contact_ids_by_group.setdefault(group, set()).add(int(contact_id))
+
+        return [
+            EsiContactsCall(
+                action=action,
+                contact_ids=tuple(contact_ids),
+                standing=standing,
+                label_ids=label_ids,
+            )
+            for (standing, label_ids), group_ids in sorted(contact_ids_by_group.items())
+            for contact_ids in iter_batches(sorted(group_ids), cls.MAX_IDS_PER_WRITE)
+        ]
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ... import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Audits contacts of synced characters for drift from alliance contacts "
+        "and starts syncing characters with a drift above the threshold. "
+        "Does not write any contacts itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--manager-id",
+            type=int,
+            default=None,
+            help="Only audit characters of the sync manager with this ID",
+        )
+
+    def handle(self, *args, **options):
+        tasks.run_drift_audit.delay(manager_pk=options["manager_id"])
+        self.stdout.write(self.style.SUCCESS("Started drift audit"))
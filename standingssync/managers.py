@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 
 from django.db import models
 from django.utils.timezone import now
@@ -12,51 +12,58 @@ from .providers import esi
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 
-class EveContactQuerySet(models.QuerySet):
-    def grouped_by_standing(self) -> dict:
-        """returns alliance contacts grouped by their standing as dict"""
-
-        contacts_by_standing = dict()
-        for contact in self.all():
-            if contact.standing not in contacts_by_standing:
-                contacts_by_standing[contact.standing] = set()
-            contacts_by_standing[contact.standing].add(contact)
-
-        return contacts_by_standing
+class EveContactSetQuerySet(models.QuerySet):
+    def unused(self, released_before) -> models.QuerySet:
+        """returns contact sets no manager is using,
+        which were last written or released before the given time
+        """
+        return self.filter(managers__isnull=True, updated_at__lt=released_before)
 
 
-class EveContactManager(models.Manager):
+class EveContactSetManager(models.Manager):
     def get_queryset(self) -> models.QuerySet:
-        return EveContactQuerySet(self.model, using=self._db)
+        return EveContactSetQuerySet(self.model, using=self._db)
+
+    def unused(self, released_before) -> models.QuerySet:
+        return self.get_queryset().unused(released_before)
 
 
 class EveEntityManager(models.Manager):
-    def create_from_esi_contact(
-        self, contact_id: int, contact_type: str
-    ) -> models.Model:
-        return self.create(
-            id=contact_id, category=self.model.Category.from_esi_type(contact_type)
-        )
+    def bulk_get_or_create_esi(self, contacts: Iterable[Tuple[int, str]]) -> None:
+        """makes sure EveEntity objects exist for all given contacts
 
-    def get_or_create_from_esi_contact(
-        self, contact_id: int, contact_type: str
-    ) -> models.Model:
-        return self.get_or_create(
-            id=contact_id,
-            defaults={"category": self.model.Category.from_esi_type(contact_type)},
-        )
+        Needs one query for fetching existing objects
+        and one query for creating all missing objects,
+        regardless of how many contacts are given.
 
-    def get_or_create_from_esi_info(self, info) -> Tuple[models.Model, bool]:
-        """returns an EveEntity object for the given esi info
-        will return existing or create new one if needed
+        Args:
+        - contacts: pairs of contact ID and ESI contact type
         """
-        id = info.get("alliance_id") or info.get("corporation_id")
-        category = (
-            self.model.Category.ALLIANCE
-            if info.get("alliance_id")
-            else self.model.Category.CORPORATION
+        categories = {
+            int(contact_id): self.model.Category.from_esi_type(contact_type)
+            for contact_id, contact_type in contacts
+        }
+        if not categories:
+            return
+
+        existing_ids = set(
+            self.filter(id__in=categories.keys()).values_list("id", flat=True)
         )
-        return self.get_or_create(id=id, defaults={"category": category})
+        new_objs = [
+            self.model(id=contact_id, category=category)
+            for contact_id, category in categories.items()
+            if contact_id not in existing_ids
+        ]
+        if new_objs:
+            logger.info("Creating %d new eve entities", len(new_objs))
+            self.bulk_create(new_objs, batch_size=500, ignore_conflicts=True)
+
+    @staticmethod
+    def esi_info_to_contact(info: dict) -> Tuple[int, str]:
+        """returns contact ID and ESI contact type for the given esi info"""
+        if info.get("alliance_id"):
+            return info["alliance_id"], "alliance"
+        return info["corporation_id"], "corporation"
 
 
 class EveWarManager(models.Manager):
@@ -94,30 +101,38 @@ class EveWarManager(models.Manager):
         return war_targets
 
     def update_from_esi(self, id: int):
-        from .models import EveEntity
+        from .models import EveEntity, EveFinishedWar
 
         logger.info("Retrieving war details for ID %s", id)
         war_info = esi.client.Wars.get_wars_war_id(war_id=id).results()
         finished = war_info.get("finished")
         if finished and finished <= now():
             logger.info("Ignoring finished war with ID %s", id)
+            EveFinishedWar.objects.get_or_create(id=id)
             return
 
         logger.info("Updating war details for ID %s", id)
+        aggressor_id, aggressor_type = EveEntity.objects.esi_info_to_contact(
+            war_info.get("aggressor")
+        )
+        defender_id, defender_type = EveEntity.objects.esi_info_to_contact(
+            war_info.get("defender")
+        )
+        allies = [
+            EveEntity.objects.esi_info_to_contact(ally_info)
+            for ally_info in war_info.get("allies") or []
+        ]
+        EveEntity.objects.bulk_get_or_create_esi(
+            [(aggressor_id, aggressor_type), (defender_id, defender_type)] + allies
+        )
         try:
             war = self.get(id=id)
         except self.model.DoesNotExist:
-            aggressor = EveEntity.objects.get_or_create_from_esi_info(
-                war_info.get("aggressor")
-            )[0]
-            defender = EveEntity.objects.get_or_create_from_esi_info(
-                war_info.get("defender")
-            )[0]
             war = self.create(
                 id=id,
-                aggressor=aggressor,
+                aggressor_id=aggressor_id,
                 declared=war_info.get("declared"),
-                defender=defender,
+                defender_id=defender_id,
                 is_mutual=war_info.get("mutual"),
                 is_open_for_allies=war_info.get("open_for_allies"),
                 retracted=war_info.get("retracted"),
@@ -126,7 +141,7 @@ class EveWarManager(models.Manager):
             )
 
         else:
-            self.update(
+            self.filter(id=id).update(
                 retracted=war_info.get("retracted"),
                 started=war_info.get("started"),
                 finished=war_info.get("finished"),
@@ -135,7 +150,5 @@ class EveWarManager(models.Manager):
             )
             war.allies.clear()
 
-        if war_info.get("allies"):
-            for ally_info in war_info.get("allies"):
-                eve_entity = EveEntity.objects.get_or_create_from_esi_info(ally_info)[0]
-                war.allies.add(eve_entity)
+        if allies:
+            war.allies.add(*[ally_id for ally_id, _ in allies])
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0003_war_target_labels"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncmanager",
+            name="contacts_etags",
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0004_sync_manager_contacts_etags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncManagerVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version_hash", models.CharField(db_index=True, max_length=32)),
+                ("previous_hash", models.CharField(default="", max_length=32)),
+                ("added_ids", models.JSONField(default=list)),
+                ("removed_ids", models.JSONField(default=list)),
+                ("changed_ids", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "manager",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="standingssync.syncmanager",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0005_sync_manager_versions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EveContactSet",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        default=None, max_length=32, null=True, unique=True
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="contact_sets",
+                        to="standingssync.syncmanager",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="evecontact",
+            name="contact_set",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="contacts",
+                to="standingssync.evecontactset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="syncmanager",
+            name="contact_set",
+            field=models.ForeignKey(
+                default=None,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="managers",
+                to="standingssync.evecontactset",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:56
+
+from django.db import migrations
+
+
+def move_contacts_into_sets(apps, schema_editor):
+    SyncManager = apps.get_model("standingssync", "SyncManager")
+    EveContact = apps.get_model("standingssync", "EveContact")
+    EveContactSet = apps.get_model("standingssync", "EveContactSet")
+    for sync_manager in SyncManager.objects.all():
+        contact_set = EveContactSet.objects.create(created_by=sync_manager)
+        EveContact.objects.filter(manager=sync_manager).update(contact_set=contact_set)
+        sync_manager.contact_set = contact_set
+        sync_manager.save(update_fields=["contact_set"])
+
+
+class Migration(migrations.Migration):
+    """Moves existing contacts into sets.
+
+    Separate from the schema changes of the contacts table,
+    because PostgreSQL can not alter a table in the same transaction
+    which has pending trigger events from writing to it.
+    """
+
+    dependencies = [
+        ("standingssync", "0006_contact_sets"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_contacts_into_sets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0007_move_contacts_into_sets"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="evecontact",
+            name="fk_eve_contact",
+        ),
+        migrations.RemoveField(
+            model_name="evecontact",
+            name="manager",
+        ),
+        migrations.AlterField(
+            model_name="evecontact",
+            name="contact_set",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="contacts",
+                to="standingssync.evecontactset",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="evecontact",
+            constraint=models.UniqueConstraint(
+                fields=("contact_set", "eve_entity"), name="fk_eve_contact"
+            ),
+        ),
+    ]
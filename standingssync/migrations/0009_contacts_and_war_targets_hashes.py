@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0008_contact_sets_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="contacts_hash",
+            field=models.CharField(default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="war_targets_hash",
+            field=models.CharField(default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="sync_mode",
+            field=models.CharField(default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="syncmanager",
+            name="contacts_hash",
+            field=models.CharField(default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="syncmanager",
+            name="war_targets_hash",
+            field=models.CharField(default="", max_length=32),
+        ),
+    ]
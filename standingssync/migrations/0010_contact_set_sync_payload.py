@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0009_contacts_and_war_targets_hashes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="evecontactset",
+            name="sync_payload",
+            field=models.JSONField(default=None, null=True),
+        ),
+    ]
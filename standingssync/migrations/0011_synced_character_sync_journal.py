@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0010_contact_set_sync_payload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="sync_journal",
+            field=models.JSONField(default=None, null=True),
+        ),
+    ]
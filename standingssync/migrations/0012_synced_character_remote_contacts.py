@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0011_synced_character_sync_journal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="remote_contacts",
+            field=models.JSONField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0012_synced_character_remote_contacts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="labels_etag",
+            field=models.CharField(default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="labels_expires",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="war_targets_label_id",
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0013_synced_character_labels_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="drift_checked_at",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="drift_score",
+            field=models.PositiveIntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0014_synced_character_drift_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="time_to_first_red",
+            field=models.FloatField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0015_synced_character_time_to_first_red"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncedcharacter",
+            name="contacts_dropped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.14 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("standingssync", "0016_synced_character_contacts_dropped"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EveFinishedWar",
+            fields=[
+                ("id", models.PositiveIntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="EveWarCrawler",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "high_water_mark",
+                    models.PositiveIntegerField(default=None, null=True),
+                ),
+                (
+                    "backfill_max_war_id",
+                    models.PositiveIntegerField(default=None, null=True),
+                ),
+                ("is_backfill_completed", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,11 @@
-import hashlib
-import json
-from typing import Optional
-
-from django.db import models, transaction
+import datetime as dt
+import threading
+from email.utils import parsedate_to_datetime
+from time import monotonic
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from esi.errors import TokenExpiredError, TokenInvalidError
@@ -12,26 +15,53 @@ from allianceauth.authentication.models import CharacterOwnership
 from allianceauth.eveonline.models import EveAllianceInfo, EveCharacter
 from allianceauth.notifications import notify
 from allianceauth.services.hooks import get_extension_logger
-from app_utils.helpers import chunks
 from app_utils.logging import LoggerAddTag
 
 from . import __title__
 from .app_settings import (
     STANDINGSSYNC_ADD_WAR_TARGETS,
     STANDINGSSYNC_CHAR_MIN_STANDING,
+    STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT,
+    STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS,
+    STANDINGSSYNC_CONTACT_SETS_GRACE_MINUTES,
+    STANDINGSSYNC_CONTACTS_PRIORITY,
+    STANDINGSSYNC_FETCH_PAGES_MAX_RETRIES,
+    STANDINGSSYNC_FETCH_PAGES_MAX_WORKERS,
+    STANDINGSSYNC_MANAGER_VERSIONS_RETENTION,
     STANDINGSSYNC_REPLACE_CONTACTS,
+    STANDINGSSYNC_STANDING_TIERS,
     STANDINGSSYNC_WAR_TARGETS_LABEL_NAME,
 )
-from .managers import EveContactManager, EveEntityManager, EveWarManager
+from .helpers import (
+    ContactChanges,
+    ContactsHasher,
+    EsiContactsCall,
+    EsiContactsPlan,
+    TokenLease,
+    calc_contacts_hash,
+    fetch_esi_pages_with_etags,
+    fetch_esi_with_etag,
+    iter_batches,
+    quantize_standing,
+    run_concurrently,
+    select_contacts,
+)
+from .managers import EveContactSetManager, EveEntityManager, EveWarManager
 from .providers import esi
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
+# max number of contacts written to the database at once
+BULK_BATCH_SIZE = 500
+
 
 class _SyncBaseModel(models.Model):
     """Base for sync models"""
 
     version_hash = models.CharField(max_length=32, default="")
+    # hashes of the alliance contacts without war targets and of the war targets
+    contacts_hash = models.CharField(max_length=32, default="")
+    war_targets_hash = models.CharField(max_length=32, default="")
     last_sync = models.DateTimeField(null=True, default=None)
 
     class Meta:
@@ -41,11 +71,14 @@ class _SyncBaseModel(models.Model):
     def is_sync_ok(self) -> bool:
         return self.last_error == self.Error.NONE
 
-    def set_sync_status(self, status: int) -> None:
-        """sets the sync status with the current date and time"""
+    def set_sync_status(self, status: int, update_fields: Iterable[str] = ()) -> None:
+        """sets the sync status with the current date and time
+
+        Saves the status together with the given other fields in one update.
+        """
         self.last_error = status
         self.last_sync = now()
-        self.save()
+        self.save(update_fields=["last_error", "last_sync", *update_fields])
 
 
 class SyncManager(_SyncBaseModel):
@@ -68,6 +101,16 @@ class SyncManager(_SyncBaseModel):
         CharacterOwnership, on_delete=models.SET_NULL, null=True, default=None
     )
     last_error = models.IntegerField(choices=Error.choices, default=Error.NONE)
+    # ETags of all pages from the last fetch of alliance contacts
+    contacts_etags = models.JSONField(default=list)
+    # set with the current version of alliance contacts, may be shared
+    contact_set = models.ForeignKey(
+        "EveContactSet",
+        on_delete=models.SET_NULL,
+        null=True,
+        default=None,
+        related_name="managers",
+    )
 
     def __str__(self):
         if self.character_ownership is not None:
@@ -76,6 +119,69 @@ class SyncManager(_SyncBaseModel):
             character_name = "None"
         return "{} ({})".format(self.alliance.alliance_name, character_name)
 
+    @property
+    def contacts(self) -> models.QuerySet:
+        """alliance contacts of the current version"""
+        if not self.contact_set_id:
+            return EveContact.objects.none()
+        return EveContact.objects.filter(contact_set_id=self.contact_set_id)
+
+    def contacts_for_sync(
+        self, war_targets_only: bool = False, apply_tiers: bool = True
+    ) -> Dict[int, Tuple[float, bool]]:
+        """returns standing and war target flag by contact ID for alliance contacts
+        as they are written to synced characters
+
+        Reads the precomputed payload of the current contact set,
+        which needs only one query regardless of the number of contacts.
+
+        Args:
+        - war_targets_only: return only war targets
+        - apply_tiers: map standings onto STANDINGSSYNC_STANDING_TIERS if configured
+        """
+        if not self.contact_set_id:
+            return dict()
+
+        payload = self.contact_set.get_sync_payload()
+        war_target_ids = set(payload["war_target_ids"])
+        tiers = STANDINGSSYNC_STANDING_TIERS if apply_tiers else []
+        contacts = dict()
+        for standing, contact_ids in payload["standings"]:
+            sync_standing = quantize_standing(standing, tiers)
+            for contact_id in contact_ids:
+                is_war_target = contact_id in war_target_ids
+                if is_war_target or not war_targets_only:
+                    contacts[contact_id] = (sync_standing, is_war_target)
+        return contacts
+
+    def calc_calls_saved_by_standing_tiers(self) -> Optional[int]:
+        """returns how many ESI calls the standing tiers save when writing
+        all alliance contacts to a character or None if no tiers are configured
+        """
+        if not STANDINGSSYNC_STANDING_TIERS:
+            return None
+
+        def plan_size(contacts: Dict[int, Tuple[float, bool]]) -> int:
+            # war targets get a placeholder label, since only the grouping matters
+            return len(
+                EsiContactsPlan(
+                    contacts_to_add=[
+                        (
+                            contact_id,
+                            standing,
+                            1
+                            if STANDINGSSYNC_ADD_WAR_TARGETS and is_war_target
+                            else None,
+                        )
+                        for contact_id, (standing, is_war_target) in contacts.items()
+                    ]
+                )
+            )
+
+        return plan_size(self.contacts_for_sync(apply_tiers=False)) - plan_size(
+            self.contacts_for_sync()
+        )
+
     def get_effective_standing(self, character: EveCharacter) -> float:
         """return the effective standing with this alliance"""
 
@@ -153,23 +259,62 @@ class SyncManager(_SyncBaseModel):
         return new_version_hash
 
     def _perform_update_from_esi(self, token, force_sync) -> str:
-        # get alliance contacts
         alliance_id = self.character_ownership.character.alliance_id
-        contacts_raw = esi.client.Contacts.get_alliances_alliance_id_contacts(
-            token=token.valid_access_token(), alliance_id=alliance_id
-        ).results()
-        contacts = {int(row["contact_id"]): row for row in contacts_raw}
-
         if STANDINGSSYNC_ADD_WAR_TARGETS:
             war_targets = EveWar.objects.war_targets(alliance_id)
-            for war_target in war_targets:
-                contacts[war_target.id] = war_target.to_esi_dict(-10.0)
-            war_target_ids = {war_target.id for war_target in war_targets}
         else:
-            war_target_ids = set()
+            war_targets = []
+        war_target_ids = {war_target.id for war_target in war_targets}
+
+        # get alliance contacts
+        contacts_raw, etags = self._fetch_alliance_contacts(
+            token, alliance_id, etags=[] if force_sync else self.contacts_etags
+        )
+        if contacts_raw is None:
+            current_war_target_ids = set(
+                self.contacts.filter(is_war_target=True).values_list(
+                    "eve_entity_id", flat=True
+                )
+            )
+            if current_war_target_ids == war_target_ids:
+                logger.info("%s: Alliance contacts are unchanged.", self)
+                return self.version_hash
+
+            if current_war_target_ids - war_target_ids:
+                # former war targets may also be alliance contacts,
+                # but their standings are not stored
+                contacts_raw, etags = self._fetch_alliance_contacts(
+                    token, alliance_id, etags=[]
+                )
+            else:
+                # the other contacts are unchanged, so they are taken from the current set
+                contacts_raw = [
+                    contact.to_esi_dict()
+                    for contact in self.contacts.filter(is_war_target=False)
+                    .exclude(eve_entity_id=alliance_id)
+                    .select_related("eve_entity")
+                ]
+                etags = self.contacts_etags
+
+        contacts = {int(row["contact_id"]): row for row in contacts_raw}
+        for war_target in war_targets:
+            contacts[war_target.id] = war_target.to_esi_dict(-10.0)
 
         # determine if contacts have changed by comparing their hashes
-        new_version_hash = hashlib.md5(json.dumps(contacts).encode("utf-8")).hexdigest()
+        version_hasher = ContactsHasher()
+        contacts_hasher = ContactsHasher()
+        war_targets_hasher = ContactsHasher()
+        for contact_id, contact in contacts.items():
+            is_war_target = contact_id in war_target_ids
+            version_hasher.update(contact_id, contact["standing"], is_war_target)
+            if is_war_target:
+                war_targets_hasher.update(contact_id, contact["standing"], True)
+            else:
+                contacts_hasher.update(contact_id, contact["standing"], False)
+        new_version_hash = version_hasher.hexdigest()
+        self.contacts_hash = contacts_hasher.hexdigest()
+        self.war_targets_hash = war_targets_hasher.hexdigest()
+        self.contacts_etags = etags
         if force_sync or new_version_hash != self.version_hash:
             logger.info(
                 "%s: Storing alliance update with %d contacts", self, len(contacts)
@@ -181,33 +326,418 @@ class SyncManager(_SyncBaseModel):
                 "contact_type": "alliance",
                 "standing": 10,
             }
+            changes = self._calc_contact_changes(
+                self._stored_contacts(self.contact_set_id), contacts, war_target_ids
+            )
+            content_hash = calc_contacts_hash(
+                (contact_id, contact["standing"], contact_id in war_target_ids)
+                for contact_id, contact in contacts.items()
+            )
+            contact_set = self._use_existing_contact_set(content_hash)
+            if contact_set:
+                logger.info("%s: Using existing contact set %s", self, contact_set.pk)
+            else:
+                contact_set = self._prepare_contact_set()
+                self._store_contacts(contact_set, contacts, war_target_ids)
+                contact_set = self._complete_contact_set(contact_set, content_hash)
+            previous_version_hash = self.version_hash
+            self._activate_contact_set(contact_set, new_version_hash)
+            if new_version_hash != previous_version_hash:
+                self._add_version(previous_version_hash, changes)
+
+        else:
+            logger.info("%s: Alliance contacts are unchanged.", self)
+            self.save(
+                update_fields=["contacts_etags", "contacts_hash", "war_targets_hash"]
+            )
+
+        return new_version_hash
+
+    @staticmethod
+    def _fetch_alliance_contacts(
+        token: Token, alliance_id: int, etags: list
+    ) -> Tuple[Optional[list], list]:
+        """fetches alliance contacts from ESI
+
+        Returns:
+        - contacts and ETags of all pages. contacts is None if they are unchanged.
+        """
+        return fetch_esi_pages_with_etags(
+            esi.client.Contacts.get_alliances_alliance_id_contacts,
+            etags=etags,
+            max_workers=STANDINGSSYNC_FETCH_PAGES_MAX_WORKERS,
+            max_retries=STANDINGSSYNC_FETCH_PAGES_MAX_RETRIES,
+            token=token.valid_access_token(),
+            alliance_id=alliance_id,
+        )
+
+    def _use_existing_contact_set(self, content_hash: str) -> Optional["EveContactSet"]:
+        """returns the existing set with the given contents if there is one
+
+        Also marks the set as recently used,
+        so it will not be reused for building other contents in the meantime.
+        """
+        contact_set = EveContactSet.objects.filter(content_hash=content_hash).first()
+        if contact_set:
+            is_unchanged = EveContactSet.objects.filter(
+                pk=contact_set.pk, content_hash=content_hash
+            ).update(updated_at=now())
+            if is_unchanged:
+                return contact_set
+        return None
+
+    def _prepare_contact_set(self) -> "EveContactSet":
+        """returns an unused contact set for building a new version of contacts
+
+        Reuses the set this manager has released most recently,
+        once it is no longer used by any manager
+        and running syncs are no longer expected to read from it.
+        So only the differences to the new version need to be written.
+        Otherwise creates a new set.
+        """
+        grace_start = now() - dt.timedelta(
+            minutes=STANDINGSSYNC_CONTACT_SETS_GRACE_MINUTES
+        )
+        contact_set = (
+            self.contact_sets.unused(released_before=grace_start)
+            .order_by("-updated_at")
+            .first()
+        )
+        if contact_set:
+            # claim the set, unless a concurrent update has already claimed it
+            claimed = EveContactSet.objects.filter(
+                pk=contact_set.pk, updated_at=contact_set.updated_at
+            ).update(content_hash=None, sync_payload=None, updated_at=now())
+            if claimed:
+                logger.info("%s: Reusing contact set %s", self, contact_set.pk)
+                contact_set.content_hash = None
+                contact_set.sync_payload = None
+                return contact_set
+
+        return EveContactSet.objects.create(created_by=self)
+
+    def _complete_contact_set(
+        self, contact_set: "EveContactSet", content_hash: str
+    ) -> "EveContactSet":
+        """marks a built set with the hash of its contents, so it can be shared
+
+        Returns:
+        - the completed set or an existing set with the same contents,
+          which was completed concurrently
+        """
+        sync_payload = contact_set.calc_sync_payload()
+        try:
             with transaction.atomic():
-                self.version_hash = new_version_hash
-                self.save()
-                self.contacts.all().delete()
-                contacts = [
+                EveContactSet.objects.filter(pk=contact_set.pk).update(
+                    content_hash=content_hash, sync_payload=sync_payload
+                )
+        except IntegrityError:
+            existing_set = self._use_existing_contact_set(content_hash)
+            if existing_set:
+                logger.info(
+                    "%s: Using contact set %s completed concurrently",
+                    self,
+                    existing_set.pk,
+                )
+                return existing_set
+            raise
+
+        contact_set.content_hash = content_hash
+        contact_set.sync_payload = sync_payload
+        return contact_set
+
+    def _activate_contact_set(
+        self, contact_set: "EveContactSet", version_hash: str
+    ) -> None:
+        """makes the given contact set the current version of alliance contacts
+
+        Readers see either the previous or the new version completely,
+        because only the pointer to the set is switched.
+        """
+        previous_contact_set_id = self.contact_set_id
+        self.contact_set = contact_set
+        self.version_hash = version_hash
+        with transaction.atomic():
+            self.save(
+                update_fields=[
+                    "contact_set",
+                    "version_hash",
+                    "contacts_hash",
+                    "war_targets_hash",
+                    "contacts_etags",
+                ]
+            )
+            if previous_contact_set_id and previous_contact_set_id != contact_set.pk:
+                EveContactSet.objects.filter(pk=previous_contact_set_id).update(
+                    updated_at=now()
+                )
+
+    def delete_obsolete_contact_sets(self) -> int:
+        """deletes contact sets created by this manager, which are no longer needed
+
+        Keeps all sets used by any manager,
+        the most recently released set for reuse
+        and all sets running syncs might still read from.
+        Also deletes obsolete sets of managers which no longer exist.
+
+        Returns:
+        - number of deleted contact sets
+        """
+        grace_start = now() - dt.timedelta(
+            minutes=STANDINGSSYNC_CONTACT_SETS_GRACE_MINUTES
+        )
+        reusable_set_pk = (
+            self.contact_sets.unused(released_before=grace_start)
+            .order_by("-updated_at")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        obsolete_sets = EveContactSet.objects.unused(
+            released_before=grace_start
+        ).filter(Q(created_by=self) | Q(created_by__isnull=True))
+        _, deleted = obsolete_sets.exclude(pk=reusable_set_pk).delete()
+        deleted_count = deleted.get(EveContactSet._meta.label, 0)
+        if deleted_count:
+            logger.info("%s: Deleted %d obsolete contact sets", self, deleted_count)
+        return deleted_count
+
+    @staticmethod
+    def _stored_contacts(
+        contact_set_id: Optional[int],
+    ) -> Dict[int, Tuple[int, float, bool]]:
+        """returns the stored contacts of a set
+
+        Returns:
+        - tuples of primary key, standing and is war target by contact ID
+        """
+        if not contact_set_id:
+            return dict()
+        return {
+            eve_entity_id: (pk, standing, is_war_target)
+            for pk, eve_entity_id, standing, is_war_target in EveContact.objects.filter(
+                contact_set_id=contact_set_id
+            ).values_list("pk", "eve_entity_id", "standing", "is_war_target")
+        }
+
+    @staticmethod
+    def _calc_contact_changes(
+        stored_contacts: Dict[int, Tuple[int, float, bool]],
+        contacts: dict,
+        war_target_ids: set,
+    ) -> ContactChanges:
+        """returns the changes from stored contacts to new contacts"""
+        changed_ids = {
+            contact_id
+            for contact_id, contact in contacts.items()
+            if contact_id in stored_contacts
+            and stored_contacts[contact_id][1:]
+            != (contact["standing"], contact_id in war_target_ids)
+        }
+        return ContactChanges(
+            added_ids=set(contacts.keys() - stored_contacts.keys()),
+            removed_ids=set(stored_contacts.keys() - contacts.keys()),
+            changed_ids=changed_ids,
+        )
+
+    def _store_contacts(
+        self, contact_set: "EveContactSet", contacts: dict, war_target_ids: set
+    ) -> None:
+        """stores contacts in a set by only writing the differences to its contacts
+
+        Args:
+        - contact_set: inactive set to store the contacts in
+        - contacts: ESI contacts by contact ID
+        - war_target_ids: IDs of contacts which are war targets
+        """
+        stored_contacts = self._stored_contacts(contact_set.pk)
+        changes = self._calc_contact_changes(stored_contacts, contacts, war_target_ids)
+        logger.info(
+            "%s: Contacts: %d added, %d changed, %d removed",
+            self,
+            len(changes.added_ids),
+            len(changes.changed_ids),
+            len(changes.removed_ids),
+        )
+        for contact_ids in iter_batches(changes.removed_ids, BULK_BATCH_SIZE):
+            contact_set.contacts.filter(eve_entity_id__in=contact_ids).delete()
+        for contact_ids in iter_batches(changes.changed_ids, BULK_BATCH_SIZE):
+            EveContact.objects.bulk_update(
+                [
+                    EveContact(
+                        pk=stored_contacts[contact_id][0],
+                        eve_entity_id=contact_id,
+                        standing=contacts[contact_id]["standing"],
+                        is_war_target=contact_id in war_target_ids,
+                    )
+                    for contact_id in contact_ids
+                ],
+                fields=["standing", "is_war_target"],
+            )
+        for contact_ids in iter_batches(changes.added_ids, BULK_BATCH_SIZE):
+            EveEntity.objects.bulk_get_or_create_esi(
+                (contact_id, contacts[contact_id]["contact_type"])
+                for contact_id in contact_ids
+            )
+            EveContact.objects.bulk_create(
+                [
                     EveContact(
-                        manager=self,
-                        eve_entity=EveEntity.objects.get_or_create_from_esi_contact(
-                            contact_id=contact_id, contact_type=contact["contact_type"]
-                        )[0],
-                        standing=contact["standing"],
+                        contact_set=contact_set,
+                        eve_entity_id=contact_id,
+                        standing=contacts[contact_id]["standing"],
                         is_war_target=contact_id in war_target_ids,
                     )
-                    for contact_id, contact in contacts.items()
+                    for contact_id in contact_ids
                 ]
-                EveContact.objects.bulk_create(contacts, batch_size=500)
+            )
 
-        else:
-            logger.info("%s: Alliance contacts are unchanged.", self)
+    def _add_version(self, previous_version_hash: str, changes: ContactChanges):
+        """records the current version with its changes and prunes old versions"""
+        if not previous_version_hash:
+            changes = ContactChanges.create_empty()
+        SyncManagerVersion.objects.create(
+            manager=self,
+            version_hash=self.version_hash,
+            previous_hash=previous_version_hash,
+            added_ids=sorted(changes.added_ids),
+            removed_ids=sorted(changes.removed_ids),
+            changed_ids=sorted(changes.changed_ids),
+        )
+        pks_to_keep = list(
+            self.versions.order_by("-pk").values_list("pk", flat=True)[
+                :STANDINGSSYNC_MANAGER_VERSIONS_RETENTION
+            ]
+        )
+        self.versions.exclude(pk__in=pks_to_keep).delete()
 
-        return new_version_hash
+    def get_changes(
+        self, from_hash: str, to_hash: str = None
+    ) -> Optional[ContactChanges]:
+        """returns the changes of alliance contacts between two versions
+
+        Args:
+        - from_hash: version hash of the older version
+        - to_hash: version hash of the newer version, defaults to the current version
+
+        Returns:
+        - changes or None if they can not be determined,
+          e.g. because the older version has already been pruned
+        """
+        if to_hash is None:
+            to_hash = self.version_hash
+        if not from_hash or not to_hash:
+            return None
+        if from_hash == to_hash:
+            return ContactChanges.create_empty()
+
+        steps = list()
+        expected_hash = to_hash
+        for version in self.versions.order_by("-pk"):
+            if version.version_hash != expected_hash:
+                if steps:
+                    return None
+                continue
+
+            steps.append(version.to_changes())
+            if version.previous_hash == from_hash:
+                changes = ContactChanges.create_empty()
+                for step in reversed(steps):
+                    changes = changes.merge(step)
+                return changes
+
+            expected_hash = version.previous_hash
+
+        return None
 
     @classmethod
     def get_esi_scopes(cls) -> list:
         return ["esi-alliances.read_contacts.v1"]
 
 
+class SyncManagerVersion(models.Model):
+    """A version of the alliance contacts of a sync manager
+    with the changes compared to the previous version
+    """
+
+    manager = models.ForeignKey(
+        SyncManager, on_delete=models.CASCADE, related_name="versions"
+    )
+    version_hash = models.CharField(max_length=32, db_index=True)
+    previous_hash = models.CharField(max_length=32, default="")
+    added_ids = models.JSONField(default=list)
+    removed_ids = models.JSONField(default=list)
+    changed_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=now)
+
+    def __str__(self) -> str:
+        return f"{self.manager_id}-{self.version_hash}"
+
+    def to_changes(self) -> ContactChanges:
+        return ContactChanges(
+            added_ids=set(self.added_ids),
+            removed_ids=set(self.removed_ids),
+            changed_ids=set(self.changed_ids),
+        )
+
+
+class EveContactSet(models.Model):
+    """A set of alliance contacts, which is one version of a sync manager's contacts
+
+    New versions are built in an unused set,
+    so readers of the current version never see half written contacts.
+    Completed sets are identified by the hash of their contents
+    and shared by all managers with the same contacts.
+    """
+
+    # manager which has built this set and may reuse it for building new versions
+    created_by = models.ForeignKey(
+        SyncManager,
+        on_delete=models.SET_NULL,
+        null=True,
+        default=None,
+        related_name="contact_sets",
+    )
+    # hash of all contacts in this set. Is None while the set is being built.
+    content_hash = models.CharField(max_length=32, null=True, default=None, unique=True)
+    # last time this set was written or stopped being the current version
+    updated_at = models.DateTimeField(default=now, db_index=True)
+    # contact IDs grouped by standing and IDs of war targets,
+    # which is computed once when the set is completed and read by synced characters
+    sync_payload = models.JSONField(null=True, default=None)
+
+    objects = EveContactSetManager()
+
+    def __str__(self) -> str:
+        return f"{self.pk}-{self.content_hash}"
+
+    def get_sync_payload(self) -> dict:
+        """returns the payload for synced characters and computes it when missing"""
+        if self.sync_payload is None:
+            self.sync_payload = self.calc_sync_payload()
+            if self.content_hash:
+                EveContactSet.objects.filter(
+                    pk=self.pk, content_hash=self.content_hash
+                ).update(sync_payload=self.sync_payload)
+        return self.sync_payload
+
+    def calc_sync_payload(self) -> dict:
+        """calculates the payload for synced characters from the stored contacts"""
+        contact_ids_by_standing = dict()
+        war_target_ids = list()
+        for eve_entity_id, standing, is_war_target in self.contacts.values_list(
+            "eve_entity_id", "standing", "is_war_target"
+        ):
+            contact_ids_by_standing.setdefault(standing, list()).append(eve_entity_id)
+            if is_war_target:
+                war_target_ids.append(eve_entity_id)
+        return {
+            "standings": [
+                [standing, sorted(contact_ids)]
+                for standing, contact_ids in sorted(contact_ids_by_standing.items())
+            ],
+            "war_target_ids": sorted(war_target_ids),
+        }
+
+
 class SyncedCharacter(_SyncBaseModel):
     """A character that has his personal contacts synced with an alliance"""
 
@@ -227,6 +757,26 @@ class SyncedCharacter(_SyncBaseModel):
     )
     last_error = models.IntegerField(choices=Error.choices, default=Error.NONE)
     has_war_targets_label = models.BooleanField(default=None, null=True)
+    # cached ID of the war targets label with ETag and expiry of the last fetch
+    war_targets_label_id = models.BigIntegerField(null=True, default=None)
+    labels_etag = models.CharField(max_length=64, default="")
+    labels_expires = models.DateTimeField(null=True, default=None)
+    # number of contacts differing from the alliance contacts at the last audit
+    drift_score = models.PositiveIntegerField(null=True, default=None)
+    drift_checked_at = models.DateTimeField(null=True, default=None)
+    # seconds from starting to write contacts in the last sync
+    # until the first contacts with negative standing were written
+    time_to_first_red = models.FloatField(null=True, default=None)
+    # number of contacts not written in the last sync,
+    # because they exceeded the contacts limit of the character
+    contacts_dropped = models.PositiveIntegerField(default=0)
+    # remaining ESI calls of an interrupted sync, so it can be resumed
+    sync_journal = models.JSONField(null=True, default=None)
+    # contacts of this character with their ETags as read by the last sync.
+    # Only kept when that sync wrote nothing, since writing outdates the ETags.
+    remote_contacts = models.JSONField(null=True, default=None)
+    # settings and war targets label of the last completed sync
+    sync_mode = models.CharField(max_length=64, default="")
 
     def __str__(self):
         return self.character_ownership.character.character_name
@@ -275,6 +825,7 @@ class SyncedCharacter(_SyncBaseModel):
         if not token:
             return False
 
+        token_lease = TokenLease(token)
         character_eff_standing = self.manager.get_effective_standing(
             self.character_ownership.character
         )
@@ -291,162 +842,544 @@ class SyncedCharacter(_SyncBaseModel):
             )
             return False
 
+        plan = None if force_sync else self._resumable_plan()
+        if plan is not None:
+            logger.info("%s: Resuming interrupted sync with %s", self, plan)
+            # contacts are unknown, because they were not fetched
+            remote_contacts = None
+            self.sync_mode = self.sync_journal["sync_mode"]
+        else:
+            character_contacts, contacts_etags = self._fetch_character_contacts(
+                token_lease
+            )
+            war_target_id = self._fetch_war_target_id(token_lease)
+            if war_target_id:
+                logger.debug("%s: Has war target label", self)
+                self.has_war_targets_label = True
+            else:
+                logger.debug("%s: Does not have war target label", self)
+                self.has_war_targets_label = False
+
+            plan = self._plan_update(force_sync, character_contacts, war_target_id)
+            logger.info("%s: Writing contacts with %s", self, plan)
+            self.sync_mode = self._calc_sync_mode(war_target_id)
+            if plan.calls:
+                # ETags of the contacts read before writing will be outdated
+                remote_contacts = None
+            else:
+                remote_contacts = self._make_remote_contacts(
+                    character_contacts, contacts_etags
+                )
+
+        self.remote_contacts = None
+        self._execute_plan(plan, token_lease)
+        self.remote_contacts = remote_contacts
+
+        # store updated version hashes with character
+        self.version_hash = self.manager.version_hash
+        self.contacts_hash = self.manager.contacts_hash
+        self.war_targets_hash = self.manager.war_targets_hash
+        self.sync_journal = None
+        self.set_sync_status(
+            self.Error.NONE,
+            update_fields=[
+                "has_war_targets_label",
+                "war_targets_label_id",
+                "labels_etag",
+                "labels_expires",
+                "version_hash",
+                "contacts_hash",
+                "war_targets_hash",
+                "sync_journal",
+                "remote_contacts",
+                "sync_mode",
+                "time_to_first_red",
+                "contacts_dropped",
+            ],
+        )
+        logger.debug("%s: %s", self, token_lease)
+        return True
+
+    def calc_update_plan(self, force_sync: bool = True) -> Optional[EsiContactsPlan]:
+        """returns the ESI calls needed for updating the contacts of this character
+        without changing anything (dry run)
+
+        Args:
+        - force_sync: will ignore version_hash if set to true
+
+        Returns:
+        - plan or None if there is no valid token
+        """
+        try:
+            token = self._query_token()
+        except (TokenInvalidError, TokenExpiredError):
+            token = None
+        if not token:
+            return None
+
+        token_lease = TokenLease(token)
+        character_contacts, _ = self._fetch_character_contacts(token_lease)
+        war_target_id = self._fetch_war_target_id(token_lease)
+        return self._plan_update(force_sync, character_contacts, war_target_id)
+
+    def audit_drift(self) -> Optional[int]:
+        """compares the contacts of this character with the current alliance contacts
+        and records the drift score without writing any contacts
+
+        Returns:
+        - drift score, i.e. the number of contacts which need to be written,
+          or None if there is no valid token
+        """
+        try:
+            token = self._query_token()
+        except (TokenInvalidError, TokenExpiredError):
+            token = None
+        if not token:
+            logger.info("%s: Can not audit drift without valid token", self)
+            return None
+
+        token_lease = TokenLease(token)
+        character_contacts, contacts_etags = self._fetch_character_contacts(token_lease)
+        war_target_id = self._fetch_war_target_id(token_lease)
+        plan = self._plan_update(True, character_contacts, war_target_id)
+        self.drift_score = plan.count_contacts()
+        self.drift_checked_at = now()
+        # the audit writes nothing, so the ETags stay valid for the next read
+        self.remote_contacts = self._make_remote_contacts(
+            character_contacts, contacts_etags
+        )
+        self.save(
+            update_fields=[
+                "drift_score",
+                "drift_checked_at",
+                "remote_contacts",
+                "war_targets_label_id",
+                "labels_etag",
+                "labels_expires",
+            ]
+        )
+        logger.info("%s: Drift score is %d", self, self.drift_score)
+        return self.drift_score
+
+    def _fetch_character_contacts(self, token_lease: TokenLease) -> Tuple[dict, list]:
+        """fetches the current contacts of this character from ESI
+
+        When the contacts are unchanged since they were last read by a sync,
+        which wrote nothing, they are taken from that state instead.
+
+        Returns:
+        - contacts by contact ID and the ETags of all pages
+        """
         character_id = self.character_ownership.character.character_id
         logger.info("%s: Fetching current contacts", self)
-        character_contacts_raw = (
-            esi.client.Contacts.get_characters_character_id_contacts(
-                token=token.valid_access_token(), character_id=character_id
-            ).results()
+        remote_contacts = self.remote_contacts or {}
+        character_contacts_raw, etags = fetch_esi_pages_with_etags(
+            esi.client.Contacts.get_characters_character_id_contacts,
+            etags=remote_contacts.get("etags", []),
+            token=token_lease.access_token(),
+            character_id=character_id,
         )
-        character_contacts = {
-            contact["contact_id"]: contact for contact in character_contacts_raw
+        if character_contacts_raw is None:
+            logger.info("%s: Contacts unchanged since last sync", self)
+            character_contacts = {
+                contact_id: {
+                    "contact_id": contact_id,
+                    "standing": standing,
+                    "label_ids": label_ids,
+                }
+                for contact_id, standing, label_ids in remote_contacts["contacts"]
+            }
+        else:
+            character_contacts = {
+                contact["contact_id"]: contact for contact in character_contacts_raw
+            }
+        return character_contacts, etags
+
+    @staticmethod
+    def _make_remote_contacts(character_contacts: dict, etags: list) -> dict:
+        """returns contacts read from ESI with their ETags in compact form
+        for storing as remote contacts
+        """
+        return {
+            "etags": etags,
+            "contacts": [
+                [contact_id, contact["standing"], contact.get("label_ids") or []]
+                for contact_id, contact in sorted(character_contacts.items())
+            ],
         }
+
+    def _fetch_war_target_id(self, token_lease: TokenLease) -> Optional[int]:
+        """returns the ID of the war targets label of this character
+
+        The ID is cached with the character and only fetched again from ESI
+        after the last response has expired and when war targets are enabled.
+        Labels are fetched with a conditional request.
+
+        Returns:
+        - ID of the label or None if the character does not have it
+        """
+        if not STANDINGSSYNC_ADD_WAR_TARGETS:
+            # a known label still allows removing old war targets
+            return self.war_targets_label_id
+        if self.labels_expires and self.labels_expires > now():
+            return self.war_targets_label_id
+
+        character_id = self.character_ownership.character.character_id
         logger.info("%s: Fetching current labels", self)
-        labels_raw = esi.client.Contacts.get_characters_character_id_contacts_labels(
-            character_id=character_id, token=token.valid_access_token()
-        ).results()
-        for row in labels_raw:
+        labels_raw, headers = fetch_esi_with_etag(
+            esi.client.Contacts.get_characters_character_id_contacts_labels,
+            etag=self.labels_etag or None,
+            character_id=character_id,
+            token=token_lease.access_token(),
+        )
+        if labels_raw is not None:
+            for row in labels_raw:
+                if (
+                    row.get("label_name").lower()
+                    == STANDINGSSYNC_WAR_TARGETS_LABEL_NAME.lower()
+                ):
+                    self.war_targets_label_id = row.get("label_id")
+                    break
+            else:
+                self.war_targets_label_id = None
+
+        self.labels_etag = headers.get("ETag") or ""
+        try:
+            self.labels_expires = parsedate_to_datetime(headers.get("Expires"))
+        except (TypeError, ValueError):
+            self.labels_expires = None
+        return self.war_targets_label_id
+
+    def _plan_update(
+        self,
+        force_sync: bool,
+        character_contacts: dict,
+        war_target_id: Optional[int],
+    ) -> EsiContactsPlan:
+        """returns the ESI calls for updating the given contacts of this character"""
+        if not force_sync and self._has_only_war_targets_changed(war_target_id):
+            logger.info("%s: Only war targets have changed", self)
+            plan = self._plan_war_targets_only(character_contacts, war_target_id)
             if (
-                row.get("label_name").lower()
-                == STANDINGSSYNC_WAR_TARGETS_LABEL_NAME.lower()
+                not self.contacts_dropped
+                and len(plan.apply(character_contacts))
+                <= STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT
             ):
-                war_target_id = row.get("label_id")
-                break
-        else:
-            war_target_id = None
+                return plan
+            logger.info("%s: Contacts limit reached, replacing all contacts", self)
+        if STANDINGSSYNC_REPLACE_CONTACTS:
+            return self._plan_replace_contacts(character_contacts, war_target_id)
+        return self._plan_merge_war_targets(character_contacts, war_target_id)
 
-        if war_target_id:
-            logger.debug("%s: Has war target label", self)
-            self.has_war_targets_label = True
-            self.save()
-            ids_to_delete = [
+    def _has_only_war_targets_changed(self, war_target_id: Optional[int]) -> bool:
+        """returns True if only the war targets have changed since the last sync
+        and the war targets can be updated through their label
+        """
+        return (
+            STANDINGSSYNC_REPLACE_CONTACTS
+            and STANDINGSSYNC_ADD_WAR_TARGETS
+            and bool(war_target_id)
+            and bool(self.contacts_hash)
+            and self.contacts_hash == self.manager.contacts_hash
+            and self.sync_mode == self._calc_sync_mode(war_target_id)
+        )
+
+    @staticmethod
+    def _calc_sync_mode(war_target_id: Optional[int]) -> str:
+        """returns the sync mode for the current settings and war targets label"""
+        return "{}:{}".format(
+            "replace" if STANDINGSSYNC_REPLACE_CONTACTS else "merge",
+            war_target_id if STANDINGSSYNC_ADD_WAR_TARGETS and war_target_id else "",
+        )
+
+    def _plan_replace_contacts(
+        self, character_contacts: dict, war_target_id: Optional[int]
+    ) -> EsiContactsPlan:
+        """plans replacing the contacts of this character with the alliance contacts
+
+        Only writes the differences: Deletes contacts the alliance does not have,
+        adds missing contacts and updates contacts with wrong standing or label.
+        """
+        label_id = war_target_id if STANDINGSSYNC_ADD_WAR_TARGETS else None
+        alliance_contacts = self._select_contacts(
+            self.manager.contacts_for_sync(), STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT
+        )
+        ids_to_delete = set()
+        contacts_to_add = list()
+        contacts_to_update = list()
+        for contact_id, contact in character_contacts.items():
+            if contact_id not in alliance_contacts:
+                ids_to_delete.add(contact_id)
+                continue
+
+            standing, is_war_target = alliance_contacts[contact_id]
+            has_label = bool(war_target_id) and war_target_id in (
+                contact["label_ids"] or []
+            )
+            needs_label = bool(label_id) and is_war_target
+            new_contact = (contact_id, standing, label_id if needs_label else None)
+            if has_label and not needs_label:
+                # labels can not be removed from a contact, so it is re-added
+                ids_to_delete.add(contact_id)
+                contacts_to_add.append(new_contact)
+            elif contact["standing"] != standing or (needs_label and not has_label):
+                contacts_to_update.append(new_contact)
+
+        contacts_to_add += [
+            (contact_id, standing, label_id if label_id and is_war_target else None)
+            for contact_id, (standing, is_war_target) in alliance_contacts.items()
+            if contact_id not in character_contacts
+        ]
+        logger.info(
+            "%s: Contacts: %d to delete, %d to add, %d to update",
+            self,
+            len(ids_to_delete),
+            len(contacts_to_add),
+            len(contacts_to_update),
+        )
+        return EsiContactsPlan(
+            ids_to_delete=ids_to_delete,
+            contacts_to_add=contacts_to_add,
+            contacts_to_update=contacts_to_update,
+        )
+
+    def _plan_merge_war_targets(
+        self, character_contacts: dict, war_target_id: Optional[int]
+    ) -> EsiContactsPlan:
+        """plans adding war targets to the existing contacts of this character
+
+        Only writes the differences: Deletes labeled contacts which are
+        no longer war targets, adds new war targets and updates existing contacts
+        with wrong standing or without label.
+        """
+        labeled_ids = (
+            {
                 contact_id
                 for contact_id, contact in character_contacts.items()
                 if contact["label_ids"] and war_target_id in contact["label_ids"]
-            ]
-            if ids_to_delete:
-                logger.info("%s: Removing old war target contacts", self)
-                self._esi_delete_contacts(
-                    character_id=character_id, token=token, contact_ids=ids_to_delete
-                )
-                for contact_id in ids_to_delete:
-                    del character_contacts[contact_id]
-        else:
-            logger.debug("%s: Does not have war target label", self)
-            self.has_war_targets_label = False
-            self.save()
+            }
+            if war_target_id
+            else set()
+        )
+        war_targets = self.manager.contacts_for_sync(war_targets_only=True)
+        ids_to_delete = labeled_ids - war_targets.keys()
+        remaining_ids = character_contacts.keys() - ids_to_delete
+        new_war_targets = self._select_contacts(
+            {
+                contact_id: contact
+                for contact_id, contact in war_targets.items()
+                if contact_id not in remaining_ids
+            },
+            STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT - len(remaining_ids),
+        )
+        contacts_to_add = [
+            (contact_id, standing, war_target_id)
+            for contact_id, (standing, _is_war_target) in new_war_targets.items()
+        ]
+        contacts_to_update = [
+            (contact_id, standing, war_target_id)
+            for contact_id, (standing, _is_war_target) in war_targets.items()
+            if contact_id in remaining_ids
+            and (
+                (war_target_id and contact_id not in labeled_ids)
+                or character_contacts[contact_id]["standing"] != standing
+            )
+        ]
+        logger.info(
+            "%s: War targets: %d to delete, %d to add, %d to update",
+            self,
+            len(ids_to_delete),
+            len(contacts_to_add),
+            len(contacts_to_update),
+        )
+        return EsiContactsPlan(
+            ids_to_delete=ids_to_delete,
+            contacts_to_add=contacts_to_add,
+            contacts_to_update=contacts_to_update,
+        )
 
-        if STANDINGSSYNC_REPLACE_CONTACTS:
-            logger.info("%s: Deleting current contacts", self)
-            self._esi_delete_contacts(
-                character_id=character_id,
-                token=token,
-                contact_ids=list(character_contacts.keys()),
+    def _select_contacts(self, contacts: dict, limit: int) -> dict:
+        """returns the contacts with the highest priority up to the limit
+        and records how many contacts were dropped
+        """
+        selected = select_contacts(contacts, limit, STANDINGSSYNC_CONTACTS_PRIORITY)
+        self.contacts_dropped = len(contacts) - len(selected)
+        if self.contacts_dropped:
+            logger.warning(
+                "%s: Dropping %d contacts exceeding the limit of %d contacts",
+                self,
+                self.contacts_dropped,
+                STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT,
             )
-            if STANDINGSSYNC_ADD_WAR_TARGETS and war_target_id:
-                logger.info("%s: Writing alliance contacts and war targets", self)
-                self._esi_update(
-                    character_id=character_id,
-                    token=token,
-                    contacts_by_standing=self.manager.contacts.filter(
-                        is_war_target=False
-                    ).grouped_by_standing(),
-                    esi_method=esi.client.Contacts.post_characters_character_id_contacts,
-                )
-                self._esi_update(
-                    character_id=character_id,
-                    token=token,
-                    contacts_by_standing=self.manager.contacts.filter(
-                        is_war_target=True
-                    ).grouped_by_standing(),
-                    esi_method=esi.client.Contacts.post_characters_character_id_contacts,
-                    label_ids=[war_target_id],
-                )
-            else:
-                logger.info("%s: Writing alliance contacts", self)
-                self._esi_update(
-                    character_id=character_id,
-                    token=token,
-                    contacts_by_standing=self.manager.contacts.all().grouped_by_standing(),
-                    esi_method=esi.client.Contacts.post_characters_character_id_contacts,
+        return selected
+
+    def _plan_war_targets_only(
+        self, character_contacts: dict, war_target_id: int
+    ) -> EsiContactsPlan:
+        """plans updating only the contacts with the war target label
+
+        Expects all other contacts to be up-to-date already.
+        """
+        war_targets = {
+            contact_id: standing
+            for contact_id, (
+                standing,
+                _is_war_target,
+            ) in self.manager.contacts_for_sync(war_targets_only=True).items()
+        }
+        labeled_ids = {
+            contact_id
+            for contact_id, contact in character_contacts.items()
+            if contact["label_ids"] and war_target_id in contact["label_ids"]
+        }
+        return EsiContactsPlan(
+            ids_to_delete=labeled_ids - war_targets.keys(),
+            contacts_to_add=[
+                (contact_id, standing, war_target_id)
+                for contact_id, standing in war_targets.items()
+                if contact_id not in character_contacts
+            ],
+            contacts_to_update=[
+                (contact_id, standing, war_target_id)
+                for contact_id, standing in war_targets.items()
+                if contact_id in character_contacts
+                and (
+                    contact_id not in labeled_ids
+                    or character_contacts[contact_id]["standing"] != standing
                 )
-        else:
-            contacts = self.manager.contacts.filter(is_war_target=True)
-            if contacts.exists():
-                logger.info("%s: Update existing contacts to war target", self)
-                contacts_by_standing = contacts.filter(
-                    eve_entity_id__in=character_contacts.keys()
-                ).grouped_by_standing()
-                self._esi_update(
-                    character_id=character_id,
-                    token=token,
-                    contacts_by_standing=contacts_by_standing,
-                    esi_method=esi.client.Contacts.put_characters_character_id_contacts,
-                    label_ids=[war_target_id] if war_target_id else None,
+            ],
+        )
+
+    def _resumable_plan(self) -> Optional[EsiContactsPlan]:
+        """returns the remaining calls of an interrupted sync to the current version
+        of alliance contacts or None if there is nothing to resume
+        """
+        journal = self.sync_journal
+        if (
+            not journal
+            or journal.get("version_hash") != self.manager.version_hash
+            or journal.get("sync_mode")
+            != self._calc_sync_mode(self.war_targets_label_id)
+        ):
+            return None
+        return EsiContactsPlan.from_calls(
+            EsiContactsCall.from_dict(call) for call in journal["calls"]
+        )
+
+    def _save_sync_journal(self, remaining_calls: List[EsiContactsCall]) -> None:
+        """records the calls still to be executed, so an interrupted sync can resume
+
+        The cached war targets label is saved with the journal,
+        because the sync mode of the journal depends on it.
+        """
+        self.sync_journal = {
+            "version_hash": self.manager.version_hash,
+            "sync_mode": self.sync_mode,
+            "calls": [call.to_dict() for call in remaining_calls],
+        }
+        self.save(
+            update_fields=[
+                "sync_journal",
+                "remote_contacts",
+                "has_war_targets_label",
+                "war_targets_label_id",
+                "labels_etag",
+                "labels_expires",
+            ]
+        )
+
+    def _execute_plan(self, plan: EsiContactsPlan, token_lease: TokenLease) -> None:
+        """executes all calls of a plan for this character
+
+        Independent calls are executed concurrently
+        if STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS is greater than 1.
+        Completed calls are recorded in the sync journal after each stage
+        and when a call fails, so a retry does not repeat them.
+        Also measures the time until the first red contacts were written.
+        """
+        self.time_to_first_red = None
+        if not plan.calls:
+            return
+
+        character_id = self.character_ownership.character.character_id
+        completed_calls = list()
+        reds_written_at = list()
+        has_failed = threading.Event()
+        started_at = monotonic()
+
+        def execute_call(call: EsiContactsCall) -> None:
+            if has_failed.is_set():
+                return
+            try:
+                self._execute_call(call, character_id, access_token)
+            except Exception:
+                has_failed.set()
+                raise
+            completed_calls.append(call)
+            if call.standing is not None and call.standing < 0:
+                reds_written_at.append(monotonic())
+
+        self._save_sync_journal(plan.calls)
+        for stage in plan.stages():
+            access_token = token_lease.access_token()
+            try:
+                run_concurrently(
+                    execute_call,
+                    stage,
+                    max_workers=STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS,
                 )
-                logger.info("%s: Add new war target contacts", self)
-                contacts_by_standing = contacts.exclude(
-                    eve_entity_id__in=character_contacts.keys()
-                ).grouped_by_standing()
-                self._esi_update(
-                    character_id=character_id,
-                    token=token,
-                    contacts_by_standing=contacts_by_standing,
-                    esi_method=esi.client.Contacts.post_characters_character_id_contacts,
-                    label_ids=[war_target_id] if war_target_id else None,
+            finally:
+                completed = set(completed_calls)
+                self._save_sync_journal(
+                    [call for call in plan.calls if call not in completed]
                 )
 
-        # store updated version hash with character
-        self.version_hash = self.manager.version_hash
-        self.save()
-        self.set_sync_status(self.Error.NONE)
-        return True
+        if reds_written_at:
+            self.time_to_first_red = min(reds_written_at) - started_at
+            logger.info(
+                "%s: First red contacts written after %.1f seconds",
+                self,
+                self.time_to_first_red,
+            )
 
     @staticmethod
-    def _esi_delete_contacts(character_id: int, token: Token, contact_ids: list):
-        max_items = 20
-        contact_ids_chunks = chunks(contact_ids, max_items)
-        for contact_ids_chunk in contact_ids_chunks:
+    def _execute_call(
+        call: EsiContactsCall, character_id: int, access_token: str
+    ) -> None:
+        if call.action == EsiContactsPlan.DELETE:
             esi.client.Contacts.delete_characters_character_id_contacts(
-                token=token.valid_access_token(),
+                token=access_token,
                 character_id=character_id,
-                contact_ids=contact_ids_chunk,
+                contact_ids=list(call.contact_ids),
             ).results()
+            return
 
-    @staticmethod
-    def _esi_update(
-        character_id: int,
-        token: Token,
-        contacts_by_standing: dict,
-        esi_method,
-        label_ids: list = None,
-        max_items: int = 100,
-    ):
-        for standing in contacts_by_standing:
-            contact_ids_chunks = chunks(
-                [contact.eve_entity_id for contact in contacts_by_standing[standing]],
-                max_items,
+        esi_methods = {
+            EsiContactsPlan.POST: esi.client.Contacts.post_characters_character_id_contacts,
+            EsiContactsPlan.PUT: esi.client.Contacts.put_characters_character_id_contacts,
+        }
+        esi_methods[call.action](
+            token=access_token,
+            character_id=character_id,
+            contact_ids=list(call.contact_ids),
+            standing=call.standing,
+            label_ids=list(call.label_ids),
+        ).results()
+
+    def _query_token(self) -> Optional[Token]:
+        return (
+            Token.objects.filter(
+                user=self.character_ownership.user,
+                character_id=self.character_ownership.character.character_id,
             )
-            for contact_ids_chunk in contact_ids_chunks:
-                esi_method(
-                    token=token.valid_access_token(),
-                    character_id=character_id,
-                    contact_ids=contact_ids_chunk,
-                    standing=standing,
-                    label_ids=label_ids if label_ids else [],
-                ).results()
+            .require_scopes(self.get_esi_scopes())
+            .require_valid()
+            .first()
+        )
 
     def _fetch_token(self) -> Optional[Token]:
         try:
-            token = (
-                Token.objects.filter(
-                    user=self.character_ownership.user,
-                    character_id=self.character_ownership.character.character_id,
-                )
-                .require_scopes(self.get_esi_scopes())
-                .require_valid()
-                .first()
-            )
+            token = self._query_token()
         except TokenInvalidError:
             logger.info("%s: sync deactivated due to invalid token", self)
             self._deactivate_sync("your token is no longer valid")
@@ -552,8 +1485,8 @@ class EveEntity(models.Model):
 class EveContact(models.Model):
     """An Eve Online contact"""
 
-    manager = models.ForeignKey(
-        SyncManager, on_delete=models.CASCADE, related_name="contacts"
+    contact_set = models.ForeignKey(
+        EveContactSet, on_delete=models.CASCADE, related_name="contacts"
     )
     eve_entity = models.ForeignKey(
         EveEntity, on_delete=models.CASCADE, related_name="contacts"
@@ -561,12 +1494,10 @@ class EveContact(models.Model):
     standing = models.FloatField()
     is_war_target = models.BooleanField()
 
-    objects = EveContactManager()
-
     class Meta:
         constraints = [
             models.UniqueConstraint(
-                fields=["manager", "eve_entity"], name="fk_eve_contact"
+                fields=["contact_set", "eve_entity"], name="fk_eve_contact"
             )
         ]
 
@@ -599,3 +1530,103 @@ class EveWar(models.Model):
 
     def __str__(self) -> str:
         return f"{self.id}: {self.aggressor} vs. {self.defender}"
+
+
+class EveFinishedWar(models.Model):
+    """ID of a war known to be finished, so it is not fetched from ESI again"""
+
+    id = models.PositiveIntegerField(primary_key=True)
+
+    def __str__(self) -> str:
+        return str(self.id)
+
+
+class EveWarCrawler(models.Model):
+    """Crawls the IDs of all wars from ESI
+
+    Fetches the newest page of wars and all pages with wars newer than
+    the highest war ID seen. Older wars are backfilled once, page by page.
+    There is only one crawler.
+    """
+
+    # highest war ID seen
+    high_water_mark = models.PositiveIntegerField(null=True, default=None)
+    # older wars are backfilled starting below this war ID
+    backfill_max_war_id = models.PositiveIntegerField(null=True, default=None)
+    is_backfill_completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"War crawler at {self.high_water_mark}"
+
+    @classmethod
+    def get_solo(cls) -> "EveWarCrawler":
+        """returns the crawler"""
+        obj, _created = cls.objects.get_or_create(pk=1)
+        return obj
+
+    def crawl(self, backfill_pages: int = 0) -> Iterator[List[int]]:
+        """fetches IDs of wars from ESI and yields them page by page
+
+        The newest page is always yielded completely, so wars which could not be
+        updated in an earlier run are seen again. Pages below it are only fetched
+        while they contain wars above the high-water mark.
+        The high-water mark is advanced once all of these pages have been
+        processed by the caller, so an interrupted crawl fetches them again.
+
+        Older wars are backfilled until ESI returns no more wars,
+        fetching at most backfill_pages pages per crawl.
+        The backfill checkpoint is stored after each page has been processed
+        by the caller, so the next crawl continues from there.
+
+        Args:
+        - backfill_pages: max number of pages of older wars to fetch
+        """
+        new_war_ids = list()
+        max_war_id = None
+        while True:
+            war_ids = self._fetch_war_ids(max_war_id)
+            unseen_ids = [
+                war_id
+                for war_id in war_ids
+                if self.high_water_mark is None or war_id > self.high_water_mark
+            ]
+            new_war_ids += unseen_ids
+            if max_war_id is None and war_ids:
+                yield war_ids
+            elif unseen_ids:
+                yield unseen_ids
+            if (
+                self.high_water_mark is None
+                or not war_ids
+                or len(unseen_ids) < len(war_ids)
+            ):
+                break
+            max_war_id = min(war_ids)
+
+        if new_war_ids:
+            logger.info("Found %d new wars", len(new_war_ids))
+            self.high_water_mark = max(new_war_ids)
+            if self.backfill_max_war_id is None and not self.is_backfill_completed:
+                self.backfill_max_war_id = min(new_war_ids)
+            self.save()
+
+        for _page in range(backfill_pages):
+            if self.is_backfill_completed or not self.backfill_max_war_id:
+                break
+            war_ids = self._fetch_war_ids(self.backfill_max_war_id)
+            if war_ids:
+                yield war_ids
+                self.backfill_max_war_id = min(war_ids)
+            else:
+                logger.info("Completed backfilling older wars")
+                self.backfill_max_war_id = None
+                self.is_backfill_completed = True
+            self.save()
+
+    @staticmethod
+    def _fetch_war_ids(max_war_id: Optional[int]) -> List[int]:
+        """returns one page of war IDs below max_war_id or the newest page"""
+        kwargs = {"max_war_id": max_war_id} if max_war_id else {}
+        logger.info("Retrieving wars from ESI with %s", kwargs)
+        return esi.client.Wars.get_wars(**kwargs).results()
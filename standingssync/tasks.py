@@ -1,12 +1,22 @@
+from typing import Optional
+
+from bravado.exception import (
+    BravadoConnectionError,
+    BravadoTimeoutError,
+    HTTPServerError,
+)
 from celery import shared_task
 
 from allianceauth.services.hooks import get_extension_logger
 from app_utils.logging import LoggerAddTag
 
 from . import __title__
+from .app_settings import (
+    STANDINGSSYNC_DRIFT_THRESHOLD,
+    STANDINGSSYNC_WARS_BACKFILL_PAGES,
+)
 from .helpers import is_esi_online
-from .models import EveWar, SyncedCharacter, SyncManager
-from .providers import esi
+from .models import EveFinishedWar, EveWar, EveWarCrawler, SyncedCharacter, SyncManager
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
@@ -55,9 +65,17 @@ def run_manager_sync(manager_pk: int, force_sync: bool = False) -> bool:
     for character_pk in alts_need_syncing:
         run_character_sync.delay(sync_char_pk=character_pk, force_sync=force_sync)
 
+    delete_obsolete_contact_sets.delay(manager_pk)
     return True
 
 
+@shared_task
+def delete_obsolete_contact_sets(manager_pk: int) -> None:
+    """deletes contact sets of given manager, which are no longer needed"""
+    sync_manager = SyncManager.objects.get(pk=manager_pk)
+    sync_manager.delete_obsolete_contact_sets()
+
+
 @shared_task
 def run_character_sync(sync_char_pk: int, force_sync: bool = False) -> bool:
     """updates in-game contacts for given character
@@ -80,16 +98,69 @@ def run_character_sync(sync_char_pk: int, force_sync: bool = False) -> bool:
 
 
 @shared_task
-def update_all_wars():
-    logger.info("Removing finished wars")
-    EveWar.objects.finished_wars().delete()
-    logger.info("Retrieving wars from ESI")
-    war_ids = esi.client.Wars.get_wars().results()
-    logger.info("Retrieved %s wars from ESI", len(war_ids))
-    for war_id in war_ids:
-        update_war.delay(war_id)
+def run_drift_audit(manager_pk: int = None) -> None:
+    """audits contacts of all synced characters for drift from alliance contacts
+
+    Args:
+    - manager_pk: only audit characters of the sync manager with this primary key
+    """
+    synced_characters = SyncedCharacter.objects.all()
+    if manager_pk:
+        synced_characters = synced_characters.filter(manager_id=manager_pk)
+    for character_pk in synced_characters.values_list("pk", flat=True):
+        audit_character_drift.delay(sync_char_pk=character_pk)
 
 
 @shared_task
+def audit_character_drift(sync_char_pk: int) -> Optional[int]:
+    """audits contacts of given character for drift from alliance contacts
+    and starts a sync if the drift is above the threshold
+
+    Returns:
+    - drift score or None if the audit was not possible
+    """
+    synced_character = SyncedCharacter.objects.get(pk=sync_char_pk)
+    drift_score = synced_character.audit_drift()
+    if drift_score is not None and drift_score > STANDINGSSYNC_DRIFT_THRESHOLD:
+        logger.info(
+            "%s: Drift score %d is above threshold. Starting sync",
+            synced_character,
+            drift_score,
+        )
+        run_character_sync.delay(sync_char_pk=sync_char_pk, force_sync=True)
+    return drift_score
+
+
+@shared_task
+def update_all_wars():
+    logger.info("Removing finished wars")
+    finished_wars = EveWar.objects.finished_wars()
+    EveFinishedWar.objects.bulk_create(
+        [
+            EveFinishedWar(id=war_id)
+            for war_id in finished_wars.values_list("id", flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    finished_wars.delete()
+    known_war_ids = set(EveWar.objects.values_list("id", flat=True))
+    logger.info("Updating %d known wars", len(known_war_ids))
+    for war_id in known_war_ids:
+        update_war.delay(war_id)
+    crawler = EveWarCrawler.get_solo()
+    for war_ids in crawler.crawl(backfill_pages=STANDINGSSYNC_WARS_BACKFILL_PAGES):
+        finished_war_ids = set(
+            EveFinishedWar.objects.filter(id__in=war_ids).values_list("id", flat=True)
+        )
+        for war_id in war_ids:
+            if war_id not in known_war_ids and war_id not in finished_war_ids:
+                update_war.delay(war_id)
+
+
+@shared_task(
+    autoretry_for=(BravadoConnectionError, BravadoTimeoutError, HTTPServerError),
+    retry_backoff=True,
+    max_retries=5,
+)
 def update_war(war_id: int):
     EveWar.objects.update_from_esi(war_id)
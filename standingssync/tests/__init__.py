@@ -1,5 +1,7 @@
 """Utility functions and classes for tests"""
 
+from bravado.exception import HTTPNotModified
+
 from django.contrib.auth.models import User
 
 from allianceauth.authentication.models import CharacterOwnership
@@ -10,7 +12,7 @@ from allianceauth.eveonline.models import (
 )
 from allianceauth.tests.auth_utils import AuthUtils
 
-from ..models import EveEntity
+from ..models import EveContactSet, EveEntity, SyncManager
 
 
 class BravadoOperationStub:
@@ -21,15 +23,25 @@ class BravadoOperationStub:
             self.also_return_response = also_return_response
 
     class ResponseStub:
-        def __init__(self, headers):
+        def __init__(self, headers, status_code=200):
             self.headers = headers
-
-    def __init__(self, data, headers: dict = None, also_return_response: bool = False):
+            self.status_code = status_code
+
+    def __init__(
+        self,
+        data,
+        headers: dict = None,
+        also_return_response: bool = False,
+        status_code: int = 200,
+    ):
         self._data = data
         self._headers = headers if headers else {"x-pages": 1}
+        self._status_code = status_code
         self.request_config = BravadoOperationStub.RequestConfig(also_return_response)
 
     def result(self, **kwargs):
+        if self._status_code == 304:
+            raise HTTPNotModified(self.ResponseStub(self._headers, self._status_code))
         if self.request_config.also_return_response:
             return [self._data, self.ResponseStub(self._headers)]
         else:
@@ -86,6 +98,14 @@ def load_eve_entities():
         )
 
 
+def create_contact_set(sync_manager: SyncManager) -> EveContactSet:
+    """creates an empty contact set as current version for a sync manager"""
+    contact_set = EveContactSet.objects.create(created_by=sync_manager)
+    sync_manager.contact_set = contact_set
+    sync_manager.save()
+    return contact_set
+
+
 def add_main_to_user(user: User, character: EveCharacter):
     CharacterOwnership.objects.create(
         user=user, owner_hash="x1" + character.character_name, character=character
@@ -0,0 +1,27 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from app_utils.testing import NoSocketsTestCase
+
+PACKAGE_PATH = "standingssync.management.commands"
+
+
+@patch(PACKAGE_PATH + ".standingssync_audit_drift.tasks")
+class TestAuditDrift(NoSocketsTestCase):
+    def test_should_start_drift_audit(self, mock_tasks):
+        # when
+        call_command("standingssync_audit_drift", stdout=StringIO())
+        # then
+        _, kwargs = mock_tasks.run_drift_audit.delay.call_args
+        self.assertIsNone(kwargs["manager_pk"])
+
+    def test_should_start_drift_audit_for_manager(self, mock_tasks):
+        # when
+        call_command(
+            "standingssync_audit_drift", "--manager-id", "42", stdout=StringIO()
+        )
+        # then
+        _, kwargs = mock_tasks.run_drift_audit.delay.call_args
+        self.assertEqual(kwargs["manager_pk"], 42)
@@ -0,0 +1,532 @@
+import datetime as dt
+import random
+from unittest.mock import Mock, patch
+
+from bravado.exception import HTTPInternalServerError
+
+from django.test import TestCase
+from django.utils.timezone import now
+from esi.errors import TokenExpiredError
+from esi.models import Token
+
+from ..helpers import (
+    ContactChanges,
+    ContactsHasher,
+    EsiContactsCall,
+    EsiContactsPlan,
+    TokenLease,
+    calc_contacts_hash,
+    fetch_esi_pages_with_etags,
+    iter_batches,
+    quantize_standing,
+    run_concurrently,
+    select_contacts,
+)
+from . import BravadoOperationStub
+
+HELPERS_PATH = "standingssync.helpers"
+
+
+class TestCalcContactsHash(TestCase):
+    CONTACTS = [
+        (1001, 10.0, False),
+        (1002, -5.0, False),
+        (2001, 0.0, False),
+        (3001, -10.0, True),
+        (3002, 2.3, False),
+    ]
+
+    def test_should_return_same_hash_for_permutations(self):
+        # given
+        expected = calc_contacts_hash(self.CONTACTS)
+        contacts = list(self.CONTACTS)
+        for _ in range(10):
+            random.shuffle(contacts)
+            # when/then
+            self.assertEqual(calc_contacts_hash(contacts), expected)
+
+    def test_should_return_same_hash_for_normalized_standings(self):
+        # given
+        contacts = [(1001, 10, False), (1002, -5, 0), (2001, -0.0, False)]
+        # when/then
+        self.assertEqual(
+            calc_contacts_hash(contacts),
+            calc_contacts_hash(
+                [(1001, 10.0, False), (1002, -5.0, False), (2001, 0.0, False)]
+            ),
+        )
+
+    def test_should_return_different_hash_when_standing_changed(self):
+        # given
+        contacts = list(self.CONTACTS)
+        contacts[1] = (1002, -10.0, False)
+        # when/then
+        self.assertNotEqual(
+            calc_contacts_hash(contacts), calc_contacts_hash(self.CONTACTS)
+        )
+
+    def test_should_return_different_hash_when_war_target_changed(self):
+        # given
+        contacts = list(self.CONTACTS)
+        contacts[3] = (3001, -10.0, False)
+        # when/then
+        self.assertNotEqual(
+            calc_contacts_hash(contacts), calc_contacts_hash(self.CONTACTS)
+        )
+
+    def test_should_return_hash_fitting_into_version_hash_field(self):
+        # when
+        result = calc_contacts_hash(self.CONTACTS)
+        # then
+        self.assertEqual(len(result), 32)
+
+
+class TestContactsHasher(TestCase):
+    def test_should_return_same_hash_as_calc_contacts_hash(self):
+        # given
+        contacts = [(1001, 10.0, False), (1002, -5.0, False), (2001, -10.0, True)]
+        hasher = ContactsHasher()
+        # when
+        for contact in reversed(contacts):
+            hasher.update(*contact)
+        # then
+        self.assertEqual(hasher.hexdigest(), calc_contacts_hash(contacts))
+
+    def test_should_return_different_hash_when_contact_is_added(self):
+        # given
+        hasher = ContactsHasher()
+        hasher.update(1001, 10.0, False)
+        previous_hash = hasher.hexdigest()
+        # when
+        hasher.update(1002, 10.0, False)
+        # then
+        self.assertNotEqual(hasher.hexdigest(), previous_hash)
+
+    def test_should_return_hash_for_no_contacts(self):
+        # when
+        result = ContactsHasher().hexdigest()
+        # then
+        self.assertEqual(len(result), 32)
+
+
+class TestIterBatches(TestCase):
+    def test_should_return_batches_from_generator(self):
+        # when
+        result = list(iter_batches((x for x in range(5)), 2))
+        # then
+        self.assertListEqual(result, [[0, 1], [2, 3], [4]])
+
+    def test_should_return_nothing_for_empty_iterable(self):
+        # when
+        result = list(iter_batches(set(), 2))
+        # then
+        self.assertListEqual(result, [])
+
+
+class TestQuantizeStanding(TestCase):
+    TIERS = [-10, -5, 0, 5, 10]
+
+    def test_should_return_closest_tier(self):
+        self.assertEqual(quantize_standing(2.3, self.TIERS), 0.0)
+        self.assertEqual(quantize_standing(6.7, self.TIERS), 5.0)
+        self.assertEqual(quantize_standing(-4.1, self.TIERS), -5.0)
+        self.assertEqual(quantize_standing(10.0, self.TIERS), 10.0)
+
+    def test_should_prefer_tier_closer_to_neutral_on_tie(self):
+        self.assertEqual(quantize_standing(7.5, self.TIERS), 5.0)
+        self.assertEqual(quantize_standing(-2.5, self.TIERS), 0.0)
+
+    def test_should_return_standing_unchanged_without_tiers(self):
+        self.assertEqual(quantize_standing(2.3, []), 2.3)
+
+
+class TestSelectContacts(TestCase):
+    CONTACTS = {
+        1001: (5.0, False),
+        1002: (-10.0, False),
+        1003: (-5.0, True),
+        1004: (10.0, False),
+        1005: (0.0, False),
+    }
+
+    def test_should_return_all_contacts_within_limit(self):
+        result = select_contacts(self.CONTACTS, 5, ["war_targets", "abs_standing"])
+        self.assertDictEqual(result, self.CONTACTS)
+
+    def test_should_select_war_targets_then_highest_absolute_standing(self):
+        result = select_contacts(self.CONTACTS, 3, ["war_targets", "abs_standing"])
+        self.assertSetEqual(set(result), {1003, 1002, 1004})
+
+    def test_should_select_red_contacts_first(self):
+        result = select_contacts(self.CONTACTS, 2, ["red"])
+        self.assertSetEqual(set(result), {1002, 1003})
+
+    def test_should_return_nothing_when_limit_is_exceeded(self):
+        result = select_contacts(self.CONTACTS, -1, ["abs_standing"])
+        self.assertDictEqual(result, {})
+
+    def test_should_raise_error_for_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            select_contacts(self.CONTACTS, 3, ["invalid"])
+
+
+class TestRunConcurrently(TestCase):
+    def test_should_return_results_in_order(self):
+        for max_workers in [1, 4]:
+            with self.subTest(max_workers=max_workers):
+                # when
+                result = run_concurrently(
+                    lambda x: x * 2, range(10), max_workers=max_workers
+                )
+                # then
+                self.assertListEqual(result, [x * 2 for x in range(10)])
+
+    def test_should_raise_exception_of_call(self):
+        # given
+        def func(x):
+            if x == 3:
+                raise ValueError()
+            return x
+
+        # when/then
+        with self.assertRaises(ValueError):
+            run_concurrently(func, range(5), max_workers=4)
+
+
+class TestTokenLease(TestCase):
+    @staticmethod
+    def _create_token(expires_in: dt.timedelta, can_refresh=True) -> Mock:
+        token = Mock(spec=Token, access_token="access-token-1", can_refresh=can_refresh)
+        token.expires = now() + expires_in
+
+        def refresh():
+            token.access_token = "access-token-2"
+            token.expires = now() + dt.timedelta(minutes=20)
+
+        token.refresh.side_effect = refresh
+        return token
+
+    def test_should_hand_out_cached_access_token(self):
+        # given
+        token = self._create_token(dt.timedelta(minutes=15))
+        token_lease = TokenLease(token)
+        # when
+        access_tokens = [token_lease.access_token() for _ in range(3)]
+        # then
+        self.assertEqual(access_tokens, ["access-token-1"] * 3)
+        self.assertFalse(token.refresh.called)
+        self.assertEqual(token_lease.requests, 3)
+        self.assertEqual(token_lease.refreshes, 0)
+        self.assertEqual(token_lease.requests_saved, 3)
+
+    def test_should_refresh_once_ahead_of_expiry(self):
+        # given
+        token = self._create_token(dt.timedelta(minutes=2))
+        token_lease = TokenLease(token)
+        # when
+        access_tokens = [token_lease.access_token() for _ in range(3)]
+        # then
+        self.assertEqual(access_tokens, ["access-token-2"] * 3)
+        self.assertEqual(token.refresh.call_count, 1)
+        self.assertEqual(token_lease.refreshes, 1)
+        self.assertEqual(token_lease.requests_saved, 2)
+
+    def test_should_raise_error_when_expiring_token_can_not_be_refreshed(self):
+        # given
+        token = self._create_token(dt.timedelta(minutes=2), can_refresh=False)
+        token_lease = TokenLease(token)
+        # when/then
+        with self.assertRaises(TokenExpiredError):
+            token_lease.access_token()
+
+
+class TestContactChanges(TestCase):
+    def test_should_merge_changes(self):
+        # given
+        first = ContactChanges(added_ids={1, 2}, removed_ids={3, 4}, changed_ids={5, 6})
+        later = ContactChanges(
+            added_ids={3, 7}, removed_ids={1, 5}, changed_ids={2, 6, 8}
+        )
+        # when
+        result = first.merge(later)
+        # then
+        self.assertSetEqual(result.added_ids, {2, 7})
+        self.assertSetEqual(result.removed_ids, {4, 5})
+        self.assertSetEqual(result.changed_ids, {3, 6, 8})
+
+    def test_should_return_same_changes_when_merged_with_empty(self):
+        # given
+        changes = ContactChanges(added_ids={1}, removed_ids={2}, changed_ids={3})
+        # when/then
+        self.assertEqual(changes.merge(ContactChanges.create_empty()), changes)
+
+
+class EsiPagesStub:
+    """Simulates a paged ESI endpoint which supports ETags"""
+
+    def __init__(self, pages: list) -> None:
+        self.pages = pages
+        self.calls = list()
+
+    def etag(self, page) -> str:
+        return f"etag-{page}-{hash(tuple(self.pages[page - 1]))}"
+
+    def esi_method(self, page, _request_options, **kwargs):
+        self.calls.append(page)
+        headers = {"X-Pages": len(self.pages), "ETag": self.etag(page)}
+        etag = _request_options.get("headers", {}).get("If-None-Match")
+        status_code = 304 if etag == self.etag(page) else 200
+        return BravadoOperationStub(
+            self.pages[page - 1], headers=headers, status_code=status_code
+        )
+
+
+class TestFetchEsiPagesWithEtags(TestCase):
+    def test_should_return_all_pages_and_etags(self):
+        # given
+        endpoint = EsiPagesStub([[1, 2], [3, 4], [5]])
+        # when
+        data, etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=[])
+        # then
+        self.assertListEqual(data, [1, 2, 3, 4, 5])
+        self.assertListEqual(
+            etags, [endpoint.etag(1), endpoint.etag(2), endpoint.etag(3)]
+        )
+
+    def test_should_return_none_when_all_pages_unchanged(self):
+        # given
+        endpoint = EsiPagesStub([[1, 2], [3, 4]])
+        _, etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=[])
+        endpoint.calls.clear()
+        # when
+        data, new_etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=etags)
+        # then
+        self.assertIsNone(data)
+        self.assertListEqual(new_etags, etags)
+        self.assertListEqual(endpoint.calls, [1, 2])
+
+    def test_should_return_all_pages_when_one_page_changed(self):
+        # given
+        endpoint = EsiPagesStub([[1, 2], [3, 4]])
+        _, etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=[])
+        endpoint.pages[1] = [3, 6]
+        # when
+        data, new_etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=etags)
+        # then
+        self.assertListEqual(data, [1, 2, 3, 6])
+        self.assertListEqual(new_etags, [endpoint.etag(1), endpoint.etag(2)])
+
+    def test_should_return_all_pages_when_page_was_added(self):
+        # given
+        endpoint = EsiPagesStub([[1, 2]])
+        _, etags = fetch_esi_pages_with_etags(endpoint.esi_method, etags=[])
+        endpoint.pages.append([3])
+        # when
+        data, _ = fetch_esi_pages_with_etags(endpoint.esi_method, etags=etags)
+        # then
+        self.assertListEqual(data, [1, 2, 3])
+
+    def test_should_treat_cached_response_with_same_etag_as_unchanged(self):
+        # given
+        def esi_method(page, _request_options, **kwargs):
+            return BravadoOperationStub([1], headers={"X-Pages": 1, "ETag": "abc"})
+
+        # when
+        data, etags = fetch_esi_pages_with_etags(esi_method, etags=["abc"])
+        # then
+        self.assertIsNone(data)
+        self.assertListEqual(etags, ["abc"])
+
+    def test_should_fetch_pages_concurrently_in_correct_order(self):
+        # given
+        endpoint = EsiPagesStub([[1], [2], [3], [4], [5]])
+        # when
+        data, etags = fetch_esi_pages_with_etags(
+            endpoint.esi_method, etags=[], max_workers=3
+        )
+        # then
+        self.assertListEqual(data, [1, 2, 3, 4, 5])
+        self.assertListEqual(etags, [endpoint.etag(page) for page in range(1, 6)])
+        self.assertSetEqual(set(endpoint.calls), {1, 2, 3, 4, 5})
+
+    @patch(HELPERS_PATH + ".sleep", lambda x: None)
+    def test_should_retry_failed_page(self):
+        # given
+        endpoint = EsiPagesStub([[1], [2], [3]])
+        failed_pages = set()
+
+        def esi_method(page, **kwargs):
+            if page == 2 and page not in failed_pages:
+                failed_pages.add(page)
+                raise HTTPInternalServerError(Mock(status_code=500))
+            return endpoint.esi_method(page, **kwargs)
+
+        # when
+        data, _ = fetch_esi_pages_with_etags(
+            esi_method, etags=[], max_workers=2, max_retries=1
+        )
+        # then
+        self.assertListEqual(data, [1, 2, 3])
+        self.assertListEqual(sorted(endpoint.calls), [1, 2, 3])
+
+    @patch(HELPERS_PATH + ".sleep", lambda x: None)
+    def test_should_raise_when_retries_exhausted(self):
+        # given
+        endpoint = EsiPagesStub([[1], [2]])
+
+        def esi_method(page, **kwargs):
+            if page == 2:
+                raise HTTPInternalServerError(Mock(status_code=500))
+            return endpoint.esi_method(page, **kwargs)
+
+        # when/then
+        with self.assertRaises(HTTPInternalServerError):
+            fetch_esi_pages_with_etags(
+                esi_method, etags=[], max_workers=2, max_retries=2
+            )
+
+
+class TestEsiContactsPlan(TestCase):
+    def test_should_create_empty_plan(self):
+        # when
+        plan = EsiContactsPlan()
+        # then
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(str(plan), "0 calls (0 delete, 0 post, 0 put)")
+
+    def test_should_batch_deletes_by_max_ids(self):
+        # when
+        plan = EsiContactsPlan(ids_to_delete=range(1, 46))
+        # then
+        self.assertEqual(len(plan), 3)
+        self.assertTupleEqual(plan.calls[0].contact_ids, tuple(range(1, 21)))
+        self.assertTupleEqual(plan.calls[2].contact_ids, tuple(range(41, 46)))
+
+    def test_should_group_writes_by_standing_and_label(self):
+        # when
+        plan = EsiContactsPlan(
+            contacts_to_add=[
+                (1001, 10.0, None),
+                (1002, -10.0, 7),
+                (1003, 10.0, None),
+                (1004, -10.0, None),
+            ]
+        )
+        # then
+        self.assertListEqual(
+            plan.calls,
+            [
+                EsiContactsCall(EsiContactsPlan.POST, (1002,), -10.0, (7,)),
+                EsiContactsCall(EsiContactsPlan.POST, (1004,), -10.0),
+                EsiContactsCall(EsiContactsPlan.POST, (1001, 1003), 10.0),
+            ],
+        )
+
+    def test_should_batch_writes_by_max_ids(self):
+        # when
+        plan = EsiContactsPlan(
+            contacts_to_update=[(contact_id, 5.0, None) for contact_id in range(250)]
+        )
+        # then
+        self.assertListEqual(
+            [len(call.contact_ids) for call in plan.calls], [100, 100, 50]
+        )
+
+    def test_should_order_deletes_first_then_writes_by_label_and_standing(self):
+        # when
+        plan = EsiContactsPlan(
+            ids_to_delete=[1],
+            contacts_to_add=[(2, 5.0, None), (3, 0.0, None)],
+            contacts_to_update=[(4, -10.0, None), (5, -10.0, 7)],
+        )
+        # then
+        self.assertListEqual(
+            [(call.action, call.contact_ids) for call in plan.calls],
+            [
+                (EsiContactsPlan.DELETE, (1,)),
+                (EsiContactsPlan.PUT, (5,)),
+                (EsiContactsPlan.PUT, (4,)),
+                (EsiContactsPlan.POST, (3,)),
+                (EsiContactsPlan.POST, (2,)),
+            ],
+        )
+        self.assertEqual(str(plan), "5 calls (1 delete, 2 post, 2 put)")
+
+    def test_should_return_deletes_and_writes_as_separate_stages(self):
+        # given
+        plan = EsiContactsPlan(
+            ids_to_delete=range(1, 30),
+            contacts_to_add=[(2, 5.0, None), (3, -5.0, None)],
+            contacts_to_update=[(40, 5.0, None)],
+        )
+        # when
+        stages = plan.stages()
+        # then
+        self.assertListEqual(
+            [[call.action for call in stage] for stage in stages],
+            [
+                [EsiContactsPlan.DELETE, EsiContactsPlan.DELETE],
+                [EsiContactsPlan.POST, EsiContactsPlan.POST, EsiContactsPlan.PUT],
+            ],
+        )
+
+    def test_should_return_no_stages_for_empty_plan(self):
+        self.assertListEqual(EsiContactsPlan().stages(), [])
+
+    def test_should_resume_from_serialized_calls(self):
+        # given
+        plan = EsiContactsPlan(
+            ids_to_delete=[1], contacts_to_add=[(2, 5.0, 7), (3, -5.0, None)]
+        )
+        calls = [call.to_dict() for call in plan.calls]
+        # when
+        resumed_plan = EsiContactsPlan.from_calls(
+            EsiContactsCall.from_dict(call) for call in calls
+        )
+        # then
+        self.assertListEqual(resumed_plan.calls, plan.calls)
+
+    def test_should_apply_plan_to_contacts(self):
+        # given
+        contacts = {
+            1: {"contact_id": 1, "standing": 5.0, "label_ids": None},
+            2: {"contact_id": 2, "standing": 5.0, "label_ids": [3]},
+            3: {"contact_id": 3, "standing": 5.0, "label_ids": None},
+        }
+        plan = EsiContactsPlan(
+            ids_to_delete=[1],
+            contacts_to_add=[(4, 10.0, 7)],
+            contacts_to_update=[(2, -5.0, 7), (3, -10.0, None)],
+        )
+        # when
+        result = plan.apply(contacts)
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                2: {"contact_id": 2, "standing": -5.0, "label_ids": [3, 7]},
+                3: {"contact_id": 3, "standing": -10.0, "label_ids": None},
+                4: {"contact_id": 4, "standing": 10.0, "label_ids": [7]},
+            },
+        )
+        self.assertEqual(contacts[2]["standing"], 5.0)
+
+    def test_should_write_war_targets_and_reds_first(self):
+        # when
+        plan = EsiContactsPlan(
+            ids_to_delete=[9],
+            contacts_to_add=[(1, 10.0, None), (2, -5.0, None), (3, -10.0, 7)],
+            contacts_to_update=[(4, 5.0, None), (5, -10.0, None)],
+        )
+        # then
+        self.assertListEqual(
+            [(call.action, call.contact_ids) for call in plan.calls],
+            [
+                (EsiContactsPlan.DELETE, (9,)),
+                (EsiContactsPlan.POST, (3,)),
+                (EsiContactsPlan.PUT, (5,)),
+                (EsiContactsPlan.POST, (2,)),
+                (EsiContactsPlan.PUT, (4,)),
+                (EsiContactsPlan.POST, (1,)),
+            ],
+        )
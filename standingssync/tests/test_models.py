@@ -1,9 +1,15 @@
 import copy
 import datetime as dt
+import hashlib
+import json
 from enum import Enum
 from unittest.mock import Mock, patch
 
+from bravado.exception import HTTPInternalServerError
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from esi.errors import TokenExpiredError, TokenInvalidError
 from esi.models import Token
@@ -13,11 +19,27 @@ from allianceauth.eveonline.models import EveCharacter
 from allianceauth.tests.auth_utils import AuthUtils
 from app_utils.testing import NoSocketsTestCase
 
-from ..models import EveContact, EveEntity, EveWar, SyncedCharacter, SyncManager
+from ..helpers import (
+    ContactChanges,
+    EsiContactsCall,
+    EsiContactsPlan,
+    quantize_standing,
+)
+from ..models import (
+    EveContact,
+    EveContactSet,
+    EveEntity,
+    EveFinishedWar,
+    EveWar,
+    EveWarCrawler,
+    SyncedCharacter,
+    SyncManager,
+)
 from . import (
     ALLIANCE_CONTACTS,
     BravadoOperationStub,
     LoadTestDataMixin,
+    create_contact_set,
     create_test_user,
 )
 
@@ -25,6 +47,12 @@ MODELS_PATH = "standingssync.models"
 MANAGERS_PATH = "standingssync.managers"
 
 
+def create_token_stub() -> Mock:
+    return Mock(
+        spec=Token, access_token="access-token", expires=now() + dt.timedelta(hours=1)
+    )
+
+
 class TestGetEffectiveStanding(LoadTestDataMixin, NoSocketsTestCase):
     @classmethod
     def setUpClass(cls):
@@ -44,9 +72,10 @@ class TestGetEffectiveStanding(LoadTestDataMixin, NoSocketsTestCase):
             {"contact_id": 2001, "contact_type": "corporation", "standing": 10},
             {"contact_id": 3001, "contact_type": "alliance", "standing": 5},
         ]
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in contacts:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,
@@ -305,9 +334,264 @@ class TestSyncManager(LoadTestDataMixin, NoSocketsTestCase):
         self.assertEqual(contact.standing, -10.0)
         self.assertTrue(contact.is_war_target)
 
-    def _run_sync(self, sync_manager, mock_esi, mock_Token):
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_reuse_released_contact_set_and_only_write_changes(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        current_set = create_contact_set(sync_manager)
+        released_set = EveContactSet.objects.create(
+            created_by=sync_manager, updated_at=now() - dt.timedelta(hours=3)
+        )
+        unchanged_contact = EveContact.objects.create(
+            contact_set=released_set,
+            eve_entity=EveEntity.objects.get(id=3015),
+            standing=10.0,
+            is_war_target=False,
+        )
+        changed_contact = EveContact.objects.create(
+            contact_set=released_set,
+            eve_entity=EveEntity.objects.get(id=1002),
+            standing=-5.0,
+            is_war_target=False,
+        )
+        EveContact.objects.create(
+            contact_set=released_set,
+            eve_entity=EveEntity.objects.get(id=1001),
+            standing=5.0,
+            is_war_target=False,
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False):
+            # when
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+        # then (continued)
+        self.assertEqual(sync_manager.contact_set, released_set)
+        self.assertFalse(sync_manager.contacts.filter(eve_entity_id=1001).exists())
+        contact = sync_manager.contacts.get(eve_entity_id=3015)
+        self.assertEqual(contact.pk, unchanged_contact.pk)
+        contact = sync_manager.contacts.get(eve_entity_id=1002)
+        self.assertEqual(contact.pk, changed_contact.pk)
+        self.assertEqual(contact.standing, 10.0)
+        current_set.refresh_from_db()
+        self.assertGreater(current_set.updated_at, now() - dt.timedelta(minutes=1))
+
+    @patch(MODELS_PATH + ".BULK_BATCH_SIZE", 4)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_store_contacts_in_batches(self, mock_esi, mock_Token):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False), patch(
+            MODELS_PATH + ".EveContact.objects.bulk_create",
+            wraps=EveContact.objects.bulk_create,
+        ) as spy_bulk_create:
+            # when
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+        # then (continued)
+        self.assertEqual(spy_bulk_create.call_count, 5)
+        contact = sync_manager.contacts.get(eve_entity_id=3015)
+        self.assertEqual(contact.standing, 10.0)
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_build_new_version_in_new_set_when_released_set_is_recent(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        current_set = create_contact_set(sync_manager)
+        EveContact.objects.create(
+            contact_set=current_set,
+            eve_entity=EveEntity.objects.get(id=1001),
+            standing=5.0,
+            is_war_target=False,
+        )
+        EveContactSet.objects.create(created_by=sync_manager)
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False):
+            # when
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+        # then (continued)
+        self.assertIsNotNone(sync_manager.contact_set.content_hash)
+        self.assertEqual(sync_manager.contact_sets.count(), 3)
+        self.assertListEqual(
+            list(current_set.contacts.values_list("eve_entity_id", flat=True)), [1001]
+        )
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_not_change_version_hash_when_order_changes(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False):
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+            version_hash = sync_manager.version_hash
+            # when
+            self._run_sync(
+                sync_manager,
+                mock_esi,
+                mock_Token,
+                alliance_contacts=list(reversed(ALLIANCE_CONTACTS)),
+            )
+        # then
+        self.assertEqual(sync_manager.version_hash, version_hash)
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_only_change_war_targets_hash_when_war_targets_change(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True):
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+            contacts_hash = sync_manager.contacts_hash
+            war_targets_hash = sync_manager.war_targets_hash
+            EveWar.objects.create(
+                id=8,
+                aggressor=EveEntity.objects.get(id=3001),
+                defender=EveEntity.objects.get(id=3003),
+                declared=now() - dt.timedelta(days=3),
+                started=now() - dt.timedelta(days=2),
+                is_mutual=False,
+                is_open_for_allies=False,
+            )
+            # when
+            sync_manager.update_from_esi()
+        # then
+        sync_manager.refresh_from_db()
+        self.assertTrue(sync_manager.contacts.get(eve_entity_id=3003).is_war_target)
+        self.assertEqual(sync_manager.contacts_hash, contacts_hash)
+        self.assertNotEqual(sync_manager.war_targets_hash, war_targets_hash)
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_skip_update_when_contacts_not_modified(self, mock_esi, mock_Token):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False):
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+            version_hash = sync_manager.version_hash
+            self.assertListEqual(sync_manager.contacts_etags, ["etag-1"])
+            mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
+                lambda *args, **kwargs: BravadoOperationStub([], status_code=304)
+            )
+            # when
+            with patch(MODELS_PATH + ".SyncManager._store_contacts") as mock_store:
+                result = sync_manager.update_from_esi()
+        # then
+        self.assertEqual(result, version_hash)
+        self.assertFalse(mock_store.called)
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_update_when_contacts_not_modified_but_war_targets_changed(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True):
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+            EveWar.objects.create(
+                id=8,
+                aggressor=EveEntity.objects.get(id=3003),
+                defender=EveEntity.objects.get(id=3001),
+                declared=now() - dt.timedelta(days=3),
+                started=now() - dt.timedelta(days=2),
+                is_mutual=False,
+                is_open_for_allies=False,
+            )
+
+            def esi_get_alliances_alliance_id_contacts(*args, **kwargs):
+                status_code = 304 if kwargs["_request_options"] else 200
+                return BravadoOperationStub(ALLIANCE_CONTACTS, status_code=status_code)
+
+            mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
+                esi_get_alliances_alliance_id_contacts
+            )
+            contacts_hash = sync_manager.contacts_hash
+            mock_esi.client.Contacts.get_alliances_alliance_id_contacts.reset_mock()
+            # when
+            sync_manager.update_from_esi()
+        # then
+        self.assertEqual(
+            mock_esi.client.Contacts.get_alliances_alliance_id_contacts.call_count, 1
+        )
+        contact = sync_manager.contacts.get(eve_entity_id=3003)
+        self.assertTrue(contact.is_war_target)
+        self.assertEqual(sync_manager.contacts_hash, contacts_hash)
+        self.assertEqual(
+            set(
+                sync_manager.contacts.filter(is_war_target=False).values_list(
+                    "eve_entity_id", flat=True
+                )
+            ),
+            {contact["contact_id"] for contact in ALLIANCE_CONTACTS}
+            | {self.character_1.alliance_id},
+        )
+
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_fetch_all_contacts_again_when_war_target_was_contact(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+        war = EveWar.objects.create(
+            id=8,
+            aggressor=EveEntity.objects.get(id=3015),
+            defender=EveEntity.objects.get(id=3001),
+            declared=now() - dt.timedelta(days=3),
+            started=now() - dt.timedelta(days=2),
+            is_mutual=False,
+            is_open_for_allies=False,
+        )
+        with patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True):
+            self._run_sync(sync_manager, mock_esi, mock_Token)
+            war.finished = now() - dt.timedelta(hours=1)
+            war.save()
+
+            def esi_get_alliances_alliance_id_contacts(*args, **kwargs):
+                status_code = 304 if kwargs["_request_options"] else 200
+                return BravadoOperationStub(ALLIANCE_CONTACTS, status_code=status_code)
+
+            mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
+                esi_get_alliances_alliance_id_contacts
+            )
+            # when
+            sync_manager.update_from_esi()
+        # then
+        contact = sync_manager.contacts.get(eve_entity_id=3015)
+        self.assertFalse(contact.is_war_target)
+        self.assertEqual(contact.standing, 10.0)
+
+    def _run_sync(self, sync_manager, mock_esi, mock_Token, alliance_contacts=None):
+        if alliance_contacts is None:
+            alliance_contacts = ALLIANCE_CONTACTS
+
         def esi_get_alliances_alliance_id_contacts(*args, **kwargs):
-            return BravadoOperationStub(ALLIANCE_CONTACTS)
+            return BravadoOperationStub(
+                alliance_contacts, headers={"x-pages": 1, "etag": "etag-1"}
+            )
 
         # given
         mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
@@ -322,7 +606,7 @@ class TestSyncManager(LoadTestDataMixin, NoSocketsTestCase):
         self.assertTrue(result)
         sync_manager.refresh_from_db()
         self.assertEqual(sync_manager.last_error, SyncManager.Error.NONE)
-        expected_contact_ids = {x["contact_id"] for x in ALLIANCE_CONTACTS}
+        expected_contact_ids = {x["contact_id"] for x in alliance_contacts}
         expected_contact_ids.add(self.character_1.alliance_id)
         result_contact_ids = set(
             sync_manager.contacts.values_list("eve_entity_id", flat=True)
@@ -331,81 +615,499 @@ class TestSyncManager(LoadTestDataMixin, NoSocketsTestCase):
         return sync_manager
 
 
-class EsiContact:
-    class ContactType(Enum):
-        CHARACTER = "character"
-        CORPORATION = "corporation"
-        ALLIANCE = "alliance"
-
-    def __init__(
-        self,
-        contact_id: int,
-        contact_type: str,
-        standing: float,
-        label_ids: list = None,
-    ) -> None:
-        if contact_type not in self.ContactType:
-            raise ValueError(f"Invalid contact_type: {contact_type}")
-
-        self._contact_id = int(contact_id)
-        self._contact_type = contact_type
-        self.standing = float(standing)
-        self.label_ids = list(label_ids) if label_ids else None
-
-    def __repr__(self) -> str:
-        return (
-            "{}("
-            "{}"
-            ", {}.{}"
-            ", standing={}"
-            "{}"
-            ")".format(
-                type(self).__name__,
-                self.contact_id,
-                type(self).__name__,
-                self.contact_type,
-                self.standing,
-                f", label_ids={self.label_ids}" if self.label_ids else "",
-            )
+@patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+@patch(MODELS_PATH + ".Token")
+@patch(MODELS_PATH + ".esi")
+class TestSyncManagerVersions(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.main_ownership_1 = CharacterOwnership.objects.get(
+            character=cls.character_1, user=cls.user_1
+        )
+        cls.user_1 = AuthUtils.add_permission_to_user_by_name(
+            "standingssync.add_syncmanager", cls.user_1
         )
 
-    def __key(self):
-        return (
-            self.contact_id,
-            self.contact_type,
-            self.standing,
-            tuple(self.label_ids) if self.label_ids else None,
+    def setUp(self) -> None:
+        self.sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
         )
 
-    def __hash__(self):
-        return hash(self.__key())
+    def _run_sync(self, mock_esi, mock_Token, alliance_contacts):
+        mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
+            lambda *args, **kwargs: BravadoOperationStub(alliance_contacts)
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = Mock(
+            spec=Token
+        )
+        return self.sync_manager.update_from_esi()
 
-    def __eq__(self, other):
-        if isinstance(other, type(self)):
-            return self.__key() == other.__key()
-        return NotImplemented
+    @staticmethod
+    def _modify_contacts(contacts, remove=None, change=None, add=None) -> list:
+        contacts = [
+            dict(obj)
+            for obj in contacts
+            if not remove or obj["contact_id"] not in remove
+        ]
+        for obj in contacts:
+            if change and obj["contact_id"] in change:
+                obj["standing"] = change[obj["contact_id"]]
+        if add:
+            contacts += add
+        return contacts
+
+    def test_should_record_versions_with_changes(self, mock_esi, mock_Token):
+        # given
+        hash_1 = self._run_sync(mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        contacts_2 = self._modify_contacts(
+            ALLIANCE_CONTACTS,
+            remove={1002},
+            change={1004: -10.0},
+            add=[{"contact_id": 1099, "contact_type": "character", "standing": 5.0}],
+        )
+        # when
+        hash_2 = self._run_sync(mock_esi, mock_Token, contacts_2)
+        # then
+        version = self.sync_manager.versions.get(version_hash=hash_2)
+        self.assertEqual(version.previous_hash, hash_1)
+        self.assertListEqual(version.added_ids, [1099])
+        self.assertListEqual(version.removed_ids, [1002])
+        self.assertListEqual(version.changed_ids, [1004])
 
-    @property
-    def contact_id(self):
-        return self._contact_id
+    def test_should_return_changes_between_versions(self, mock_esi, mock_Token):
+        # given
+        hash_1 = self._run_sync(mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        contacts_2 = self._modify_contacts(
+            ALLIANCE_CONTACTS,
+            remove={1002, 1005},
+            add=[{"contact_id": 1099, "contact_type": "character", "standing": 5.0}],
+        )
+        hash_2 = self._run_sync(mock_esi, mock_Token, contacts_2)
+        contacts_3 = self._modify_contacts(
+            contacts_2,
+            remove={1099},
+            change={1004: -10.0},
+            add=[{"contact_id": 1002, "contact_type": "character", "standing": 10.0}],
+        )
+        hash_3 = self._run_sync(mock_esi, mock_Token, contacts_3)
+        # when
+        changes_1_3 = self.sync_manager.get_changes(hash_1)
+        changes_1_2 = self.sync_manager.get_changes(hash_1, hash_2)
+        changes_3_3 = self.sync_manager.get_changes(hash_3)
+        # then
+        self.assertSetEqual(changes_1_3.added_ids, set())
+        self.assertSetEqual(changes_1_3.removed_ids, {1005})
+        self.assertSetEqual(changes_1_3.changed_ids, {1002, 1004})
+        self.assertSetEqual(changes_1_2.added_ids, {1099})
+        self.assertSetEqual(changes_1_2.removed_ids, {1002, 1005})
+        self.assertSetEqual(changes_1_2.changed_ids, set())
+        self.assertEqual(changes_3_3, ContactChanges.create_empty())
+
+    def test_should_return_none_for_unknown_version(self, mock_esi, mock_Token):
+        # given
+        self._run_sync(mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        # when/then
+        self.assertIsNone(self.sync_manager.get_changes("unknown"))
+        self.assertIsNone(self.sync_manager.get_changes(""))
 
-    @property
-    def contact_type(self):
-        return self._contact_type
+    @patch(MODELS_PATH + ".STANDINGSSYNC_MANAGER_VERSIONS_RETENTION", 1)
+    def test_should_prune_old_versions(self, mock_esi, mock_Token):
+        # given
+        hash_1 = self._run_sync(mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        hash_2 = self._run_sync(
+            mock_esi,
+            mock_Token,
+            self._modify_contacts(ALLIANCE_CONTACTS, change={1004: -10.0}),
+        )
+        # when
+        hash_3 = self._run_sync(
+            mock_esi,
+            mock_Token,
+            self._modify_contacts(ALLIANCE_CONTACTS, change={1004: -5.0}),
+        )
+        # then
+        self.assertListEqual(
+            list(self.sync_manager.versions.values_list("version_hash", flat=True)),
+            [hash_3],
+        )
+        self.assertIsNone(self.sync_manager.get_changes(hash_1))
+        self.assertSetEqual(self.sync_manager.get_changes(hash_2).changed_ids, {1004})
 
-    def to_esi_dict(self) -> dict:
-        return {
-            "contact_id": self.contact_id,
-            "contact_type": self.ContactType(self.contact_type),
-            "standing": self.standing,
-            "label_ids": self.label_ids,
-        }
 
+@patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+@patch(MODELS_PATH + ".Token")
+@patch(MODELS_PATH + ".esi")
+class TestSyncManagerSharedContactSets(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.user_1 = AuthUtils.add_permission_to_user_by_name(
+            "standingssync.add_syncmanager", cls.user_1
+        )
+        cls.user_3 = create_test_user(cls.character_3)
+        cls.user_3 = AuthUtils.add_permission_to_user_by_name(
+            "standingssync.add_syncmanager", cls.user_3
+        )
 
-class EsiCharacterContacts:
-    """Simulates the contacts for a character on ESI"""
+    def setUp(self) -> None:
+        self.sync_manager_1 = SyncManager.objects.create(
+            alliance=self.alliance_1,
+            character_ownership=CharacterOwnership.objects.get(
+                character=self.character_1, user=self.user_1
+            ),
+        )
+        self.sync_manager_3 = SyncManager.objects.create(
+            alliance=self.alliance_3,
+            character_ownership=CharacterOwnership.objects.get(
+                character=self.character_3, user=self.user_3
+            ),
+        )
 
-    def __init__(self) -> None:
+    @staticmethod
+    def _run_sync(sync_manager, mock_esi, mock_Token, alliance_contacts):
+        mock_esi.client.Contacts.get_alliances_alliance_id_contacts.side_effect = (
+            lambda *args, **kwargs: BravadoOperationStub(alliance_contacts)
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = Mock(
+            spec=Token
+        )
+        sync_manager.update_from_esi()
+        sync_manager.refresh_from_db()
+
+    def test_should_share_contact_set_with_same_contacts(self, mock_esi, mock_Token):
+        # given
+        self._run_sync(
+            self.sync_manager_1,
+            mock_esi,
+            mock_Token,
+            ALLIANCE_CONTACTS
+            + [{"contact_id": 3003, "contact_type": "alliance", "standing": 10.0}],
+        )
+        # when
+        self._run_sync(
+            self.sync_manager_3,
+            mock_esi,
+            mock_Token,
+            ALLIANCE_CONTACTS
+            + [{"contact_id": 3001, "contact_type": "alliance", "standing": 10.0}],
+        )
+        # then
+        self.assertEqual(
+            self.sync_manager_1.contact_set, self.sync_manager_3.contact_set
+        )
+        self.assertEqual(EveContactSet.objects.count(), 1)
+        self.assertEqual(self.sync_manager_3.contact_sets.count(), 0)
+
+    def test_should_store_sync_payload_when_completing_set(self, mock_esi, mock_Token):
+        # when
+        self._run_sync(self.sync_manager_1, mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        # then
+        contact_set = EveContactSet.objects.get(pk=self.sync_manager_1.contact_set_id)
+        self.assertIsNotNone(contact_set.sync_payload)
+        self.assertDictEqual(contact_set.sync_payload, contact_set.calc_sync_payload())
+
+    def test_should_not_share_contact_set_with_different_contacts(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        self._run_sync(self.sync_manager_1, mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        # when
+        self._run_sync(self.sync_manager_3, mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        # then
+        self.assertNotEqual(
+            self.sync_manager_1.contact_set, self.sync_manager_3.contact_set
+        )
+        self.assertTrue(self.sync_manager_1.contacts.filter(eve_entity_id=3001))
+        self.assertTrue(self.sync_manager_3.contacts.filter(eve_entity_id=3003))
+
+    def test_should_not_reuse_contact_set_used_by_other_manager(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        contacts = ALLIANCE_CONTACTS + [
+            {"contact_id": 3003, "contact_type": "alliance", "standing": 10.0}
+        ]
+        self._run_sync(self.sync_manager_1, mock_esi, mock_Token, contacts)
+        shared_set = self.sync_manager_1.contact_set
+        contacts = ALLIANCE_CONTACTS + [
+            {"contact_id": 3001, "contact_type": "alliance", "standing": 10.0}
+        ]
+        self._run_sync(self.sync_manager_3, mock_esi, mock_Token, contacts)
+        EveContactSet.objects.filter(pk=shared_set.pk).update(
+            updated_at=now() - dt.timedelta(hours=3)
+        )
+        # when
+        self._run_sync(self.sync_manager_1, mock_esi, mock_Token, ALLIANCE_CONTACTS)
+        # then
+        self.assertNotEqual(self.sync_manager_1.contact_set, shared_set)
+        self.assertEqual(self.sync_manager_3.contact_set, shared_set)
+        self.assertTrue(self.sync_manager_3.contacts.filter(eve_entity_id=3003))
+        self.assertEqual(self.sync_manager_1.delete_obsolete_contact_sets(), 0)
+
+
+class TestSyncManagerDeleteObsoleteContactSets(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.main_ownership_1 = CharacterOwnership.objects.get(
+            character=cls.character_1, user=cls.user_1
+        )
+
+    def setUp(self) -> None:
+        self.sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1, character_ownership=self.main_ownership_1
+        )
+
+    def _create_released_set(self, hours_ago: int) -> EveContactSet:
+        return EveContactSet.objects.create(
+            created_by=self.sync_manager,
+            updated_at=now() - dt.timedelta(hours=hours_ago),
+        )
+
+    def test_should_keep_current_and_most_recently_released_set(self):
+        # given
+        current_set = create_contact_set(self.sync_manager)
+        current_set.updated_at = now() - dt.timedelta(hours=5)
+        current_set.save()
+        set_1 = self._create_released_set(hours_ago=4)
+        set_2 = self._create_released_set(hours_ago=2)
+        # when
+        result = self.sync_manager.delete_obsolete_contact_sets()
+        # then
+        self.assertEqual(result, 1)
+        self.assertSetEqual(
+            set(self.sync_manager.contact_sets.all()), {current_set, set_2}
+        )
+        self.assertFalse(EveContactSet.objects.filter(pk=set_1.pk).exists())
+
+    def test_should_keep_sets_which_might_still_be_read(self):
+        # given
+        current_set = create_contact_set(self.sync_manager)
+        set_1 = self._create_released_set(hours_ago=4)
+        set_2 = self._create_released_set(hours_ago=0)
+        # when
+        result = self.sync_manager.delete_obsolete_contact_sets()
+        # then
+        self.assertEqual(result, 0)
+        self.assertSetEqual(
+            set(self.sync_manager.contact_sets.all()), {current_set, set_1, set_2}
+        )
+
+
+class TestSyncManagerStandingTiers(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.sync_manager = SyncManager.objects.create(
+            alliance=cls.alliance_1,
+            character_ownership=CharacterOwnership.objects.get(
+                character=cls.character_1, user=cls.user_1
+            ),
+        )
+        contact_set = create_contact_set(cls.sync_manager)
+        for contact_id, standing, is_war_target in [
+            (1001, 2.3, False),
+            (1002, 6.7, False),
+            (1003, -4.1, False),
+            (2001, 5.0, False),
+            (3001, -10.0, True),
+        ]:
+            EveContact.objects.create(
+                contact_set=contact_set,
+                eve_entity=EveEntity.objects.get(id=contact_id),
+                standing=standing,
+                is_war_target=is_war_target,
+            )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_STANDING_TIERS", [])
+    def test_should_return_contacts_unchanged_without_tiers(self):
+        # when
+        result = self.sync_manager.contacts_for_sync()
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                1001: (2.3, False),
+                1002: (6.7, False),
+                1003: (-4.1, False),
+                2001: (5.0, False),
+                3001: (-10.0, True),
+            },
+        )
+        self.assertIsNone(self.sync_manager.calc_calls_saved_by_standing_tiers())
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_STANDING_TIERS", [-10, -5, 0, 5, 10])
+    def test_should_map_standings_onto_tiers(self):
+        # when
+        result = self.sync_manager.contacts_for_sync()
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                1001: (0.0, False),
+                1002: (5.0, False),
+                1003: (-5.0, False),
+                2001: (5.0, False),
+                3001: (-10.0, True),
+            },
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_STANDING_TIERS", [-10, -5, 0, 5, 10])
+    def test_should_return_war_targets_only(self):
+        # when
+        result = self.sync_manager.contacts_for_sync(war_targets_only=True)
+        # then
+        self.assertDictEqual(result, {3001: (-10.0, True)})
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_STANDING_TIERS", [-10, 0, 10])
+    def test_should_calc_calls_saved_by_tiers(self):
+        # when
+        result = self.sync_manager.calc_calls_saved_by_standing_tiers()
+        # then
+        self.assertEqual(result, 2)
+
+
+class TestEveContactSet(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.sync_manager = SyncManager.objects.create(
+            alliance=cls.alliance_1,
+            character_ownership=CharacterOwnership.objects.get(
+                character=cls.character_1, user=cls.user_1
+            ),
+        )
+        cls.contact_set = create_contact_set(cls.sync_manager)
+        cls.contact_set.content_hash = "abc"
+        cls.contact_set.save()
+        for contact_id, standing, is_war_target in [
+            (1001, 5.0, False),
+            (1002, -10.0, True),
+            (2001, 5.0, False),
+        ]:
+            EveContact.objects.create(
+                contact_set=cls.contact_set,
+                eve_entity=EveEntity.objects.get(id=contact_id),
+                standing=standing,
+                is_war_target=is_war_target,
+            )
+
+    def test_should_calc_sync_payload(self):
+        # when
+        result = self.contact_set.calc_sync_payload()
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                "standings": [[-10.0, [1002]], [5.0, [1001, 2001]]],
+                "war_target_ids": [1002],
+            },
+        )
+
+    def test_should_compute_missing_sync_payload_once(self):
+        # when
+        EveContactSet.objects.get(pk=self.contact_set.pk).get_sync_payload()
+        # then
+        contact_set = EveContactSet.objects.get(pk=self.contact_set.pk)
+        self.assertIsNotNone(contact_set.sync_payload)
+        with self.assertNumQueries(0):
+            contact_set.get_sync_payload()
+
+    def test_should_read_contacts_for_sync_with_one_query(self):
+        # given
+        EveContactSet.objects.get(pk=self.contact_set.pk).get_sync_payload()
+        sync_manager = SyncManager.objects.get(pk=self.sync_manager.pk)
+        # when
+        with self.assertNumQueries(1):
+            result = sync_manager.contacts_for_sync()
+        # then
+        self.assertDictEqual(
+            result, {1001: (5.0, False), 1002: (-10.0, True), 2001: (5.0, False)}
+        )
+
+
+class EsiContact:
+    class ContactType(Enum):
+        CHARACTER = "character"
+        CORPORATION = "corporation"
+        ALLIANCE = "alliance"
+
+    def __init__(
+        self,
+        contact_id: int,
+        contact_type: str,
+        standing: float,
+        label_ids: list = None,
+    ) -> None:
+        if contact_type not in self.ContactType:
+            raise ValueError(f"Invalid contact_type: {contact_type}")
+
+        self._contact_id = int(contact_id)
+        self._contact_type = contact_type
+        self.standing = float(standing)
+        self.label_ids = list(label_ids) if label_ids else None
+
+    def __repr__(self) -> str:
+        return (
+            "{}("
+            "{}"
+            ", {}.{}"
+            ", standing={}"
+            "{}"
+            ")".format(
+                type(self).__name__,
+                self.contact_id,
+                type(self).__name__,
+                self.contact_type,
+                self.standing,
+                f", label_ids={self.label_ids}" if self.label_ids else "",
+            )
+        )
+
+    def __key(self):
+        return (
+            self.contact_id,
+            self.contact_type,
+            self.standing,
+            tuple(self.label_ids) if self.label_ids else None,
+        )
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __eq__(self, other):
+        if isinstance(other, type(self)):
+            return self.__key() == other.__key()
+        return NotImplemented
+
+    @property
+    def contact_id(self):
+        return self._contact_id
+
+    @property
+    def contact_type(self):
+        return self._contact_type
+
+    def to_esi_dict(self) -> dict:
+        return {
+            "contact_id": self.contact_id,
+            "contact_type": self.ContactType(self.contact_type),
+            "standing": self.standing,
+            "label_ids": self.label_ids,
+        }
+
+
+class EsiCharacterContacts:
+    """Simulates the contacts for a character on ESI"""
+
+    def __init__(self) -> None:
         self._contacts = dict()
         self._labels = dict()
 
@@ -429,18 +1131,34 @@ class EsiCharacterContacts:
     def labels(self, character_id: int) -> dict:
         return self._labels[character_id] if character_id in self._labels else dict()
 
-    def esi_get_characters_character_id_contacts(self, character_id, token, page=None):
+    def esi_get_characters_character_id_contacts(
+        self, character_id, token, page=None, _request_options=None
+    ):
         contacts = [obj.to_esi_dict() for obj in self._contacts[character_id].values()]
-        return BravadoOperationStub(contacts)
+        etag = '"{}"'.format(
+            hashlib.md5(
+                json.dumps(
+                    sorted(contacts, key=lambda obj: obj["contact_id"]), default=str
+                ).encode()
+            ).hexdigest()
+        )
+        headers = {"x-pages": 1, "ETag": etag}
+        if _request_options and _request_options["headers"]["If-None-Match"] == etag:
+            return BravadoOperationStub([], headers=headers, status_code=304)
+        return BravadoOperationStub(contacts, headers=headers)
 
     def esi_get_characters_character_id_contacts_labels(
-        self, character_id, token, page=None
+        self, character_id, token, _request_options=None
     ):
         labels = [
             {"label_id": k, "label_name": v}
             for k, v in self._labels[character_id].items()
         ]
-        return BravadoOperationStub(labels)
+        etag = '"{}"'.format(hashlib.md5(json.dumps(labels).encode()).hexdigest())
+        headers = {"ETag": etag}
+        if _request_options and _request_options["headers"]["If-None-Match"] == etag:
+            return BravadoOperationStub([], headers=headers, status_code=304)
+        return BravadoOperationStub(labels, headers=headers)
 
     def esi_post_characters_character_id_contacts(
         self, character_id, contact_ids, standing, token, label_ids=None
@@ -518,9 +1236,10 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         )
         # sync manager with contacts
         cls.sync_manager.contacts.all().delete()
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in ALLIANCE_CONTACTS:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,
@@ -605,21 +1324,840 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         self.assertEqual(
             self.synced_character_2.last_error, SyncManager.Error.TOKEN_INVALID
         )
-        self.assertIsNotNone(self.synced_character_2.last_sync)
+        self.assertIsNotNone(self.synced_character_2.last_sync)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_do_nothing_if_no_update_needed(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        self.synced_character_2.version_hash = self.sync_manager.version_hash
+        self.synced_character_2.save()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertIsNone(self.synced_character_2.last_sync)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_replace_all_contacts_1(self, mock_esi, mock_Token):
+        """run normal sync for a character which has blue standing"""
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            set(self.alliance_contacts),
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.0)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_replace_all_contacts_2(self, mock_esi, mock_Token):
+        """run normal sync for a character which has no standing and allow neutrals"""
+        # given
+        character_id = (
+            self.synced_character_3.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_3, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_3.last_error, SyncedCharacter.Error.NONE)
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            set(self.alliance_contacts),
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_replace_all_contacts_and_add_war_targets(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        expected = {
+            EsiContact(
+                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+            EsiContact(
+                3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(1016, EsiContact.ContactType.CHARACTER, standing=10.0),
+            EsiContact(2013, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(2012, EsiContact.ContactType.CORPORATION, standing=-5.0),
+            EsiContact(1005, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            EsiContact(1013, EsiContact.ContactType.CHARACTER, standing=-5.0),
+            EsiContact(1002, EsiContact.ContactType.CHARACTER, standing=10.0),
+            EsiContact(3014, EsiContact.ContactType.ALLIANCE, standing=5.0),
+            EsiContact(2015, EsiContact.ContactType.CORPORATION, standing=10.0),
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=-10.0),
+            EsiContact(2014, EsiContact.ContactType.CORPORATION, standing=0.0),
+            EsiContact(3015, EsiContact.ContactType.ALLIANCE, standing=10.0),
+            EsiContact(1012, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            EsiContact(1015, EsiContact.ContactType.CHARACTER, standing=5.0),
+            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=10.0),
+            EsiContact(3012, EsiContact.ContactType.ALLIANCE, standing=-5.0),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)), expected
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT", 6)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_replace_contacts_up_to_the_contacts_limit(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        self.assertEqual(self.synced_character_2.contacts_dropped, 12)
+        expected = {
+            EsiContact(
+                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(
+                3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(1002, EsiContact.ContactType.CHARACTER, standing=10.0),
+            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=10.0),
+            EsiContact(1005, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            EsiContact(1012, EsiContact.ContactType.CHARACTER, standing=-10.0),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)), expected
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHARACTER_CONTACTS_LIMIT", 3)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_not_add_war_targets_beyond_the_contacts_limit(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.contacts_dropped, 1)
+        expected = {
+            EsiContact(1014, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)), expected
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_update_war_targets_only_1(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        expected = {
+            EsiContact(1014, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+            EsiContact(3013, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            expected,
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_update_war_targets_only_2(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        expected = {
+            EsiContact(
+                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+            EsiContact(
+                3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
+            ),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            expected,
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_only_write_differences_when_replacing_contacts(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        character_contacts = [
+            contact
+            for contact in self.alliance_contacts
+            if contact.contact_id not in {1002, 1004}
+        ] + [
+            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=5.0),
+            EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=-10.0),
+        ]
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, character_contacts)
+        for method_name in [
+            "esi_post_characters_character_id_contacts",
+            "esi_put_characters_character_id_contacts",
+        ]:
+            setattr(
+                esi_character_contacts,
+                method_name,
+                Mock(side_effect=getattr(esi_character_contacts, method_name)),
+            )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            set(self.alliance_contacts),
+        )
+        mock_delete = mock_esi.client.Contacts.delete_characters_character_id_contacts
+        _, kwargs = mock_delete.call_args
+        self.assertEqual(mock_delete.call_count, 1)
+        self.assertListEqual(kwargs["contact_ids"], [1099])
+        mock_post = esi_character_contacts.esi_post_characters_character_id_contacts
+        _, kwargs = mock_post.call_args
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertListEqual(kwargs["contact_ids"], [1002])
+        mock_put = esi_character_contacts.esi_put_characters_character_id_contacts
+        _, kwargs = mock_put.call_args
+        self.assertEqual(mock_put.call_count, 1)
+        self.assertListEqual(kwargs["contact_ids"], [1004])
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_only_write_war_target_differences_when_merging(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        character_contacts = [
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(
+                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(3013, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+            EsiContact(
+                1099, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+        ]
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, character_contacts)
+        for method_name in [
+            "esi_post_characters_character_id_contacts",
+            "esi_put_characters_character_id_contacts",
+        ]:
+            setattr(
+                esi_character_contacts,
+                method_name,
+                Mock(side_effect=getattr(esi_character_contacts, method_name)),
+            )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        expected = {
+            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
+            EsiContact(
+                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
+            ),
+            EsiContact(
+                3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
+            ),
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)), expected
+        )
+        mock_delete = mock_esi.client.Contacts.delete_characters_character_id_contacts
+        _, kwargs = mock_delete.call_args
+        self.assertEqual(mock_delete.call_count, 1)
+        self.assertListEqual(kwargs["contact_ids"], [1099])
+        mock_post = esi_character_contacts.esi_post_characters_character_id_contacts
+        self.assertFalse(mock_post.called)
+        mock_put = esi_character_contacts.esi_put_characters_character_id_contacts
+        _, kwargs = mock_put.call_args
+        self.assertEqual(mock_put.call_count, 1)
+        self.assertListEqual(kwargs["contact_ids"], [3013])
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHARACTER_WRITE_MAX_WORKERS", 4)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_write_contacts_concurrently(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(
+            character_id,
+            [
+                EsiContact(
+                    1002,
+                    EsiContact.ContactType.CHARACTER,
+                    standing=10.0,
+                    label_ids=[1],
+                ),
+                EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=-10.0),
+            ],
+        )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        expected = {
+            EsiContact(
+                contact.contact_id,
+                contact.contact_type,
+                standing=contact.standing,
+                label_ids=[1] if contact.contact_id in {1014, 3013} else None,
+            )
+            for contact in self.alliance_contacts
+        }
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)), expected
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_save_status_with_one_update(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.alliance_contacts)
+        # when
+        with CaptureQueriesContext(connection) as context:
+            result = self._run_sync(
+                mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+            )
+        # then
+        self.assertTrue(result)
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "standingssync_syncedcharacter"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        self.assertEqual(
+            self.synced_character_2.version_hash, self.sync_manager.version_hash
+        )
+        self.assertFalse(self.synced_character_2.has_war_targets_label)
+        self.assertIsNone(self.synced_character_2.time_to_first_red)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_audit_drift_without_writing(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        character_contacts = [
+            contact
+            for contact in self.alliance_contacts
+            if contact.contact_id not in {1002, 1004}
+        ] + [
+            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=5.0),
+            EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=-10.0),
+        ]
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, character_contacts)
+        mock_esi.client.Contacts.get_characters_character_id_contacts.side_effect = (
+            esi_character_contacts.esi_get_characters_character_id_contacts
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = (
+            create_token_stub()
+        )
+        # when
+        result = self.synced_character_2.audit_drift()
+        # then
+        self.assertEqual(result, 3)
+        self.synced_character_2.refresh_from_db()
+        self.assertEqual(self.synced_character_2.drift_score, 3)
+        self.assertIsNotNone(self.synced_character_2.drift_checked_at)
+        self.assertFalse(
+            mock_esi.client.Contacts.delete_characters_character_id_contacts.called
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.post_characters_character_id_contacts.called
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.put_characters_character_id_contacts.called
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_not_download_unchanged_contacts_again_in_next_audit(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        character_contacts = [
+            contact
+            for contact in self.alliance_contacts
+            if contact.contact_id not in {1002, 1004}
+        ]
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, character_contacts)
+        mock_get_contacts = Mock(
+            side_effect=esi_character_contacts.esi_get_characters_character_id_contacts
+        )
+        mock_esi.client.Contacts.get_characters_character_id_contacts = (
+            mock_get_contacts
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = (
+            create_token_stub()
+        )
+        etag = esi_character_contacts.esi_get_characters_character_id_contacts(
+            character_id=character_id, token=None
+        )._headers["ETag"]
+        first_result = SyncedCharacter.objects.get(
+            pk=self.synced_character_2.pk
+        ).audit_drift()
+        synced_character = SyncedCharacter.objects.get(pk=self.synced_character_2.pk)
+        # when
+        result = synced_character.audit_drift()
+        # then
+        self.assertEqual(result, first_result)
+        self.assertEqual(mock_get_contacts.call_count, 2)
+        _, kwargs = mock_get_contacts.call_args
+        self.assertEqual(kwargs["_request_options"]["headers"]["If-None-Match"], etag)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_not_fetch_labels_when_war_targets_disabled(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, [])
+        esi_character_contacts.esi_get_characters_character_id_contacts_labels = Mock(
+            side_effect=(
+                esi_character_contacts.esi_get_characters_character_id_contacts_labels
+            )
+        )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertFalse(
+            esi_character_contacts.esi_get_characters_character_id_contacts_labels.called
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_use_cached_label_id_until_expired(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, [])
+        esi_character_contacts.esi_get_characters_character_id_contacts_labels = Mock()
+        self.synced_character_2.war_targets_label_id = 1
+        self.synced_character_2.labels_expires = now() + dt.timedelta(minutes=5)
+        self.synced_character_2.save()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertFalse(
+            esi_character_contacts.esi_get_characters_character_id_contacts_labels.called
+        )
+        self.assertTrue(self.synced_character_2.has_war_targets_label)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_revalidate_cached_label_id_with_etag(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, [])
+        etag = esi_character_contacts.esi_get_characters_character_id_contacts_labels(
+            character_id=character_id, token=None
+        )._headers["ETag"]
+        self.synced_character_2.war_targets_label_id = 1
+        self.synced_character_2.labels_etag = etag
+        self.synced_character_2.labels_expires = now() - dt.timedelta(minutes=5)
+        self.synced_character_2.save()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(self.synced_character_2.war_targets_label_id, 1)
+        self.assertEqual(self.synced_character_2.labels_etag, etag)
+        self.assertIsNone(self.synced_character_2.labels_expires)
+        self.assertTrue(self.synced_character_2.has_war_targets_label)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_not_store_contacts_after_writing(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(
+            character_id,
+            [EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=-10.0)],
+        )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertGreaterEqual(self.synced_character_2.time_to_first_red, 0)
+        self.assertIsNone(self.synced_character_2.remote_contacts)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_store_contacts_when_nothing_was_written(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, self.alliance_contacts)
+        etag = esi_character_contacts.esi_get_characters_character_id_contacts(
+            character_id=character_id, token=None
+        )._headers["ETag"]
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        remote_contacts = self.synced_character_2.remote_contacts
+        self.assertListEqual(remote_contacts["etags"], [etag])
+        self.assertSetEqual(
+            {
+                (contact_id, standing)
+                for contact_id, standing, _ in remote_contacts["contacts"]
+            },
+            {
+                (contact.contact_id, contact.standing)
+                for contact in self.alliance_contacts
+            },
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_use_stored_contacts_when_unchanged_on_esi(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, [])
+        etag = esi_character_contacts.esi_get_characters_character_id_contacts(
+            character_id=character_id, token=None
+        )._headers["ETag"]
+        self.synced_character_2.remote_contacts = {
+            "etags": [etag],
+            "contacts": [
+                [contact.contact_id, contact.standing, []]
+                for contact in self.alliance_contacts
+            ],
+        }
+        self.synced_character_2.save()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertFalse(
+            mock_esi.client.Contacts.delete_characters_character_id_contacts.called
+        )
+        self.assertListEqual(list(esi_character_contacts.contacts(character_id)), [])
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_resume_interrupted_sync(self, mock_esi, mock_Token):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_contacts(character_id, [])
+        post_contacts = esi_character_contacts.esi_post_characters_character_id_contacts
+        post_calls = list()
+
+        def failing_post(**kwargs):
+            post_calls.append(kwargs["contact_ids"])
+            if len(post_calls) == 2:
+                raise HTTPInternalServerError(Mock(status_code=502))
+            return post_contacts(**kwargs)
+
+        esi_character_contacts.esi_post_characters_character_id_contacts = failing_post
+        with self.assertRaises(HTTPInternalServerError):
+            self._run_sync(
+                mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+            )
+        self.synced_character_2.refresh_from_db()
+        remaining_calls = self.synced_character_2.sync_journal["calls"]
+        remaining_ids = [call["contact_ids"] for call in remaining_calls]
+        self.assertNotIn(post_calls[0], remaining_ids)
+        self.assertIn(post_calls[1], remaining_ids)
+        esi_character_contacts.esi_post_characters_character_id_contacts = Mock(
+            side_effect=post_contacts
+        )
+        mock_esi.client.Contacts.get_characters_character_id_contacts.reset_mock()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            set(self.alliance_contacts),
+        )
+        self.assertEqual(
+            esi_character_contacts.esi_post_characters_character_id_contacts.call_count,
+            len(remaining_calls),
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.get_characters_character_id_contacts.called
+        )
+        self.assertIsNone(self.synced_character_2.sync_journal)
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_resume_interrupted_first_sync_with_war_targets_label(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        character_id = (
+            self.synced_character_2.character_ownership.character.character_id
+        )
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(character_id, [])
+        post_contacts = esi_character_contacts.esi_post_characters_character_id_contacts
+        post_calls = list()
+
+        def failing_post(**kwargs):
+            post_calls.append(kwargs["contact_ids"])
+            if len(post_calls) == 2:
+                raise HTTPInternalServerError(Mock(status_code=502))
+            return post_contacts(**kwargs)
+
+        esi_character_contacts.esi_post_characters_character_id_contacts = failing_post
+        with self.assertRaises(HTTPInternalServerError):
+            self._run_sync(
+                mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+            )
+        synced_character = SyncedCharacter.objects.get(pk=self.synced_character_2.pk)
+        esi_character_contacts.esi_post_characters_character_id_contacts = post_contacts
+        mock_esi.client.Contacts.get_characters_character_id_contacts.reset_mock()
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, synced_character, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
+        self.assertFalse(
+            mock_esi.client.Contacts.get_characters_character_id_contacts.called
+        )
+        self.assertIsNone(synced_character.sync_journal)
+        self.assertEqual(synced_character.sync_mode, "replace:1")
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
     @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_do_nothing_if_no_update_needed(self, mock_esi, mock_Token):
+    def test_should_not_resume_sync_for_outdated_version(self, mock_esi, mock_Token):
         # given
         character_id = (
             self.synced_character_2.character_ownership.character.character_id
         )
         esi_character_contacts = EsiCharacterContacts()
-        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
-        self.synced_character_2.version_hash = self.sync_manager.version_hash
+        esi_character_contacts.setup_contacts(character_id, [])
+        self.synced_character_2.sync_journal = {
+            "version_hash": "old",
+            "calls": [EsiContactsCall(EsiContactsPlan.DELETE, (1001, 1002)).to_dict()],
+        }
         self.synced_character_2.save()
         # when
         result = self._run_sync(
@@ -627,64 +2165,119 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         )
         # then
         self.assertTrue(result)
-        self.assertIsNone(self.synced_character_2.last_sync)
+        self.assertSetEqual(
+            set(esi_character_contacts.contacts(character_id)),
+            set(self.alliance_contacts),
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.delete_characters_character_id_contacts.called
+        )
+        self.assertIsNone(self.synced_character_2.sync_journal)
 
+    @patch(MODELS_PATH + ".STANDINGSSYNC_STANDING_TIERS", [-10, -5, 0, 5, 10])
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
     @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_replace_all_contacts_1(self, mock_esi, mock_Token):
-        """run normal sync for a character which has blue standing"""
+    def test_should_write_standings_mapped_onto_tiers(self, mock_esi, mock_Token):
         # given
         character_id = (
             self.synced_character_2.character_ownership.character.character_id
         )
         esi_character_contacts = EsiCharacterContacts()
-        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        esi_character_contacts.setup_contacts(character_id, [])
         # when
         result = self._run_sync(
             mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
         )
         # then
         self.assertTrue(result)
-        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        expected = {
+            EsiContact(
+                contact.contact_id,
+                contact.contact_type,
+                standing=quantize_standing(contact.standing, [-10, -5, 0, 5, 10]),
+            )
+            for contact in self.alliance_contacts
+        }
         self.assertSetEqual(
-            set(esi_character_contacts.contacts(character_id)),
-            set(self.alliance_contacts),
+            set(esi_character_contacts.contacts(character_id)), expected
         )
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", False)
     @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
-    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.0)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_replace_all_contacts_2(self, mock_esi, mock_Token):
-        """run normal sync for a character which has no standing and allow neutrals"""
+    def test_should_calc_update_plan_without_writing(self, mock_esi, mock_Token):
         # given
         character_id = (
-            self.synced_character_3.character_ownership.character.character_id
+            self.synced_character_2.character_ownership.character.character_id
         )
+        character_contacts = [
+            contact
+            for contact in self.alliance_contacts
+            if contact.contact_id not in {1002, 1004}
+        ] + [
+            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=5.0),
+            EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=-10.0),
+        ]
         esi_character_contacts = EsiCharacterContacts()
-        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
-        # when
-        result = self._run_sync(
-            mock_esi, mock_Token, self.synced_character_3, esi_character_contacts
+        esi_character_contacts.setup_contacts(character_id, character_contacts)
+        mock_esi.client.Contacts.get_characters_character_id_contacts.side_effect = (
+            esi_character_contacts.esi_get_characters_character_id_contacts
+        )
+        mock_esi.client.Contacts.get_characters_character_id_contacts_labels.side_effect = (
+            esi_character_contacts.esi_get_characters_character_id_contacts_labels
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = (
+            create_token_stub()
         )
+        # when
+        plan = self.synced_character_2.calc_update_plan()
         # then
-        self.assertTrue(result)
-        self.assertEqual(self.synced_character_3.last_error, SyncedCharacter.Error.NONE)
+        self.assertEqual(len(plan), 3)
+        self.assertDictEqual(
+            plan.count_by_action(),
+            {
+                EsiContactsPlan.DELETE: 1,
+                EsiContactsPlan.POST: 1,
+                EsiContactsPlan.PUT: 1,
+            },
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.delete_characters_character_id_contacts.called
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.post_characters_character_id_contacts.called
+        )
+        self.assertFalse(
+            mock_esi.client.Contacts.put_characters_character_id_contacts.called
+        )
         self.assertSetEqual(
             set(esi_character_contacts.contacts(character_id)),
-            set(self.alliance_contacts),
+            set(character_contacts),
+        )
+
+    @patch(MODELS_PATH + ".Token")
+    def test_should_return_no_update_plan_without_token(self, mock_Token):
+        # given
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = (
+            None
         )
+        # when
+        plan = self.synced_character_2.calc_update_plan()
+        # then
+        self.assertIsNone(plan)
+        self.synced_character_2.refresh_from_db()
+        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_replace_all_contacts_and_add_war_targets(
+    def test_should_re_add_contact_which_is_no_longer_a_war_target(
         self, mock_esi, mock_Token
     ):
         # given
@@ -693,106 +2286,168 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         )
         esi_character_contacts = EsiCharacterContacts()
         esi_character_contacts.setup_labels(character_id, {1: "war targets"})
-        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        esi_character_contacts.setup_contacts(
+            character_id,
+            [
+                EsiContact(
+                    1002,
+                    EsiContact.ContactType.CHARACTER,
+                    standing=10.0,
+                    label_ids=[1],
+                )
+            ],
+        )
         # when
         result = self._run_sync(
             mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
         )
         # then
         self.assertTrue(result)
-        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
+        self.assertIn(
+            EsiContact(1002, EsiContact.ContactType.CHARACTER, standing=10.0),
+            set(esi_character_contacts.contacts(character_id)),
+        )
+
+    @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
+    @patch(MODELS_PATH + ".Token")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_only_update_war_targets_when_contacts_are_unchanged(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        SyncManager.objects.filter(pk=self.sync_manager.pk).update(
+            contacts_hash="contacts-1", war_targets_hash="war-targets-2"
+        )
+        SyncedCharacter.objects.filter(pk=self.synced_character_2.pk).update(
+            contacts_hash="contacts-1",
+            war_targets_hash="war-targets-1",
+            sync_mode="replace:1",
+        )
+        synced_character = SyncedCharacter.objects.get(pk=self.synced_character_2.pk)
+        character_id = synced_character.character_ownership.character.character_id
+        esi_character_contacts = EsiCharacterContacts()
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(
+            character_id,
+            [
+                contact
+                for contact in self.alliance_contacts
+                if contact.contact_id not in {1014, 3013}
+            ]
+            + [
+                EsiContact(
+                    1014,
+                    EsiContact.ContactType.CHARACTER,
+                    standing=-10.0,
+                    label_ids=[1],
+                ),
+                EsiContact(
+                    3001,
+                    EsiContact.ContactType.ALLIANCE,
+                    standing=-10.0,
+                    label_ids=[1],
+                ),
+            ],
+        )
+        # when
+        result = self._run_sync(
+            mock_esi, mock_Token, synced_character, esi_character_contacts
+        )
+        # then
+        self.assertTrue(result)
         expected = {
+            contact
+            for contact in self.alliance_contacts
+            if contact.contact_id not in {1014, 3013}
+        } | {
             EsiContact(
                 1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
             ),
-            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
             EsiContact(
                 3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
             ),
-            EsiContact(1016, EsiContact.ContactType.CHARACTER, standing=10.0),
-            EsiContact(2013, EsiContact.ContactType.CORPORATION, standing=5.0),
-            EsiContact(2012, EsiContact.ContactType.CORPORATION, standing=-5.0),
-            EsiContact(1005, EsiContact.ContactType.CHARACTER, standing=-10.0),
-            EsiContact(1013, EsiContact.ContactType.CHARACTER, standing=-5.0),
-            EsiContact(1002, EsiContact.ContactType.CHARACTER, standing=10.0),
-            EsiContact(3014, EsiContact.ContactType.ALLIANCE, standing=5.0),
-            EsiContact(2015, EsiContact.ContactType.CORPORATION, standing=10.0),
-            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=-10.0),
-            EsiContact(2014, EsiContact.ContactType.CORPORATION, standing=0.0),
-            EsiContact(3015, EsiContact.ContactType.ALLIANCE, standing=10.0),
-            EsiContact(1012, EsiContact.ContactType.CHARACTER, standing=-10.0),
-            EsiContact(1015, EsiContact.ContactType.CHARACTER, standing=5.0),
-            EsiContact(1004, EsiContact.ContactType.CHARACTER, standing=10.0),
-            EsiContact(3012, EsiContact.ContactType.ALLIANCE, standing=-5.0),
         }
         self.assertSetEqual(
             set(esi_character_contacts.contacts(character_id)), expected
         )
+        mock_delete = mock_esi.client.Contacts.delete_characters_character_id_contacts
+        self.assertEqual(mock_delete.call_count, 1)
+        _, kwargs = mock_delete.call_args
+        self.assertListEqual(kwargs["contact_ids"], [3001])
+        self.assertEqual(synced_character.war_targets_hash, "war-targets-2")
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
-    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_update_war_targets_only_1(self, mock_esi, mock_Token):
+    def test_should_replace_all_contacts_when_sync_mode_has_changed(
+        self, mock_esi, mock_Token
+    ):
         # given
-        character_id = (
-            self.synced_character_2.character_ownership.character.character_id
+        SyncManager.objects.filter(pk=self.sync_manager.pk).update(
+            contacts_hash="contacts-1", war_targets_hash="war-targets-2"
         )
+        SyncedCharacter.objects.filter(pk=self.synced_character_2.pk).update(
+            contacts_hash="contacts-1",
+            war_targets_hash="war-targets-1",
+            sync_mode="merge:1",
+        )
+        synced_character = SyncedCharacter.objects.get(pk=self.synced_character_2.pk)
+        character_id = synced_character.character_ownership.character.character_id
         esi_character_contacts = EsiCharacterContacts()
-        esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
+        esi_character_contacts.setup_labels(character_id, {1: "war targets"})
+        esi_character_contacts.setup_contacts(
+            character_id,
+            list(self.alliance_contacts)
+            + [EsiContact(1099, EsiContact.ContactType.CHARACTER, standing=5.0)],
+        )
         # when
         result = self._run_sync(
-            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+            mock_esi, mock_Token, synced_character, esi_character_contacts
         )
         # then
         self.assertTrue(result)
-        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
-        expected = {
-            EsiContact(1014, EsiContact.ContactType.CHARACTER, standing=-10.0),
-            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
-            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
-            EsiContact(3013, EsiContact.ContactType.ALLIANCE, standing=-10.0),
+        contact_ids = {
+            contact.contact_id
+            for contact in esi_character_contacts.contacts(character_id)
         }
-        self.assertSetEqual(
-            set(esi_character_contacts.contacts(character_id)),
-            expected,
-        )
+        self.assertNotIn(1099, contact_ids)
+        self.assertEqual(synced_character.sync_mode, "replace:1")
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
-    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
+    @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_CHAR_MIN_STANDING", 0.01)
     @patch(MODELS_PATH + ".Token")
     @patch(MODELS_PATH + ".esi")
-    def test_should_update_war_targets_only_2(self, mock_esi, mock_Token):
+    def test_should_replace_all_contacts_when_contacts_have_changed(
+        self, mock_esi, mock_Token
+    ):
         # given
-        character_id = (
-            self.synced_character_2.character_ownership.character.character_id
+        SyncManager.objects.filter(pk=self.sync_manager.pk).update(
+            contacts_hash="contacts-2"
         )
+        SyncedCharacter.objects.filter(pk=self.synced_character_2.pk).update(
+            contacts_hash="contacts-1"
+        )
+        synced_character = SyncedCharacter.objects.get(pk=self.synced_character_2.pk)
+        character_id = synced_character.character_ownership.character.character_id
         esi_character_contacts = EsiCharacterContacts()
         esi_character_contacts.setup_labels(character_id, {1: "war targets"})
         esi_character_contacts.setup_contacts(character_id, self.CHARACTER_CONTACTS)
         # when
         result = self._run_sync(
-            mock_esi, mock_Token, self.synced_character_2, esi_character_contacts
+            mock_esi, mock_Token, synced_character, esi_character_contacts
         )
         # then
         self.assertTrue(result)
-        self.assertEqual(self.synced_character_2.last_error, SyncedCharacter.Error.NONE)
-        expected = {
-            EsiContact(
-                1014, EsiContact.ContactType.CHARACTER, standing=-10.0, label_ids=[1]
-            ),
-            EsiContact(2011, EsiContact.ContactType.CORPORATION, standing=5.0),
-            EsiContact(3011, EsiContact.ContactType.ALLIANCE, standing=-10.0),
-            EsiContact(
-                3013, EsiContact.ContactType.ALLIANCE, standing=-10.0, label_ids=[1]
-            ),
-        }
-        self.assertSetEqual(
-            set(esi_character_contacts.contacts(character_id)),
-            expected,
+        self.assertEqual(
+            len(esi_character_contacts.contacts(character_id)),
+            len(self.alliance_contacts),
         )
+        self.assertEqual(synced_character.contacts_hash, "contacts-2")
 
     @patch(MODELS_PATH + ".STANDINGSSYNC_ADD_WAR_TARGETS", True)
     @patch(MODELS_PATH + ".STANDINGSSYNC_REPLACE_CONTACTS", False)
@@ -903,7 +2558,9 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         mock_esi.client.Contacts.get_characters_character_id_contacts_labels = (
             esi_character_contacts.esi_get_characters_character_id_contacts_labels
         )
-        mock_Token.objects.filter = Mock()
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = (
+            create_token_stub()
+        )
         synced_character.character_ownership.user = (
             AuthUtils.add_permission_to_user_by_name(
                 "standingssync.add_syncedcharacter",
@@ -1004,74 +2661,55 @@ class TestSyncCharacter(LoadTestDataMixin, TestCase):
         )
 
 
-class TestEveContactManager(LoadTestDataMixin, NoSocketsTestCase):
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-
-        # 1 user with 1 alt character
-        cls.user_1 = create_test_user(cls.character_1)
-        cls.main_ownership_1 = CharacterOwnership.objects.get(
-            character=cls.character_1, user=cls.user_1
-        )
-        cls.alt_ownership = CharacterOwnership.objects.create(
-            character=cls.character_2, owner_hash="x2", user=cls.user_1
-        )
-
-        # sync manager with contacts
-        cls.sync_manager = SyncManager.objects.create(
-            alliance=cls.alliance_1,
-            character_ownership=cls.main_ownership_1,
-            version_hash="new",
-        )
-        for contact in ALLIANCE_CONTACTS:
-            EveContact.objects.create(
-                manager=cls.sync_manager,
-                eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
-                standing=contact["standing"],
-                is_war_target=False,
-            )
-
-        # sync char
-        cls.synced_character = SyncedCharacter.objects.create(
-            character_ownership=cls.alt_ownership, manager=cls.sync_manager
-        )
-
-    def test_grouped_by_standing(self):
-        c = {
-            int(x.eve_entity_id): x
-            for x in self.sync_manager.contacts.order_by("eve_entity_id")
-        }
-        expected = {
-            -10.0: {c[1005], c[1012], c[3011], c[2011]},
-            -5.0: {c[1013], c[3012], c[2012]},
-            0.0: {c[1014], c[3013], c[2014]},
-            5.0: {c[1015], c[3014], c[2013]},
-            10.0: {c[1002], c[1004], c[1016], c[3015], c[2015]},
-        }
-        result = self.sync_manager.contacts.all().grouped_by_standing()
-        self.maxDiff = None
-        self.assertDictEqual(result, expected)
-
-
-class TestEveEntityManagerGetOrCreateFromEsiInfo(NoSocketsTestCase):
+class TestEveEntityManagerEsiInfoToContact(NoSocketsTestCase):
     def test_should_return_corporation(self):
         # given
         info = {"corporation_id": 2001}
         # when
-        obj, created = EveEntity.objects.get_or_create_from_esi_info(info)
+        result = EveEntity.objects.esi_info_to_contact(info)
         # then
-        self.assertEqual(obj.id, 2001)
-        self.assertEqual(obj.category, EveEntity.Category.CORPORATION)
+        self.assertEqual(result, (2001, "corporation"))
 
     def test_should_return_alliance(self):
         # given
         info = {"alliance_id": 3001}
         # when
-        obj, created = EveEntity.objects.get_or_create_from_esi_info(info)
+        result = EveEntity.objects.esi_info_to_contact(info)
+        # then
+        self.assertEqual(result, (3001, "alliance"))
+
+
+class TestEveEntityManagerBulkGetOrCreateEsi(NoSocketsTestCase):
+    def test_should_create_missing_and_keep_existing_entities(self):
+        # given
+        EveEntity.objects.create(id=1001, category=EveEntity.Category.CHARACTER)
+        # when
+        EveEntity.objects.bulk_get_or_create_esi(
+            [(1001, "character"), (2001, "corporation"), (3001, "alliance")]
+        )
         # then
-        self.assertEqual(obj.id, 3001)
-        self.assertEqual(obj.category, EveEntity.Category.ALLIANCE)
+        self.assertDictEqual(
+            dict(EveEntity.objects.values_list("id", "category")),
+            {
+                1001: EveEntity.Category.CHARACTER,
+                2001: EveEntity.Category.CORPORATION,
+                3001: EveEntity.Category.ALLIANCE,
+            },
+        )
+
+    def test_should_need_constant_number_of_queries(self):
+        # given
+        EveEntity.objects.create(id=1001, category=EveEntity.Category.CHARACTER)
+        contacts = [(1001, "character")] + [(id, "character") for id in range(2, 200)]
+        # when/then
+        with self.assertNumQueries(2):
+            EveEntity.objects.bulk_get_or_create_esi(contacts)
+        self.assertEqual(EveEntity.objects.count(), 199)
+
+    def test_should_do_nothing_when_no_contacts_given(self):
+        # when/then
+        with self.assertNumQueries(0):
+            EveEntity.objects.bulk_get_or_create_esi([])
 
 
 class TestEveWarManagerActiveWars(LoadTestDataMixin, NoSocketsTestCase):
@@ -1337,6 +2975,7 @@ class TestEveWarManager(LoadTestDataMixin, NoSocketsTestCase):
         EveWar.objects.update_from_esi(id=1)
         # then
         self.assertFalse(EveWar.objects.filter(id=1).exists())
+        self.assertTrue(EveFinishedWar.objects.filter(id=1).exists())
 
     @patch(MANAGERS_PATH + ".esi")
     def test_should_update_existing_war_from_esi(self, mock_esi):
@@ -1412,3 +3051,106 @@ class TestEveEntity(LoadTestDataMixin, NoSocketsTestCase):
         self.assertDictEqual(
             result, {"contact_id": 3001, "contact_type": "alliance", "standing": -2.0}
         )
+
+
+class EsiWarsStub:
+    """Simulates fetching pages of war IDs from ESI"""
+
+    PAGE_SIZE = 3
+
+    def __init__(self, war_ids) -> None:
+        self.war_ids = sorted(war_ids, reverse=True)
+
+    def get_wars(self, max_war_id=None):
+        war_ids = [
+            war_id
+            for war_id in self.war_ids
+            if max_war_id is None or war_id < max_war_id
+        ]
+        return BravadoOperationStub(war_ids[: self.PAGE_SIZE])
+
+
+@patch(MODELS_PATH + ".esi")
+class TestEveWarCrawler(NoSocketsTestCase):
+    @staticmethod
+    def _crawl(backfill_pages=10) -> list:
+        crawler = EveWarCrawler.get_solo()
+        return list(crawler.crawl(backfill_pages=backfill_pages))
+
+    def test_should_fetch_all_wars_on_first_crawl(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        # when
+        result = self._crawl()
+        # then
+        self.assertListEqual(result, [[10, 9, 8], [7, 6, 5], [4, 3, 2], [1]])
+        crawler = EveWarCrawler.get_solo()
+        self.assertEqual(crawler.high_water_mark, 10)
+        self.assertTrue(crawler.is_backfill_completed)
+        self.assertIsNone(crawler.backfill_max_war_id)
+
+    def test_should_fetch_newest_page_and_wars_above_high_water_mark(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        self._crawl()
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 18)).get_wars
+        # when
+        result = self._crawl()
+        # then
+        self.assertListEqual(result, [[17, 16, 15], [14, 13, 12], [11]])
+        crawler = EveWarCrawler.get_solo()
+        self.assertEqual(crawler.high_water_mark, 17)
+
+    def test_should_fetch_newest_page_again_when_there_are_no_new_wars(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        self._crawl()
+        mock_esi.client.Wars.get_wars.reset_mock()
+        # when
+        result = self._crawl()
+        # then
+        self.assertListEqual(result, [[10, 9, 8]])
+        self.assertEqual(mock_esi.client.Wars.get_wars.call_count, 1)
+
+    def test_should_restart_interrupted_backfill_from_checkpoint(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        crawler = EveWarCrawler.get_solo()
+        pages = crawler.crawl(backfill_pages=10)
+        next(pages)
+        next(pages)
+        next(pages)  # interrupted while processing the third page
+        pages.close()
+        # when
+        result = self._crawl()
+        # then
+        self.assertListEqual(result, [[10, 9, 8], [4, 3, 2], [1]])
+
+    def test_should_continue_backfill_in_next_crawl_after_budget(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        result_1 = self._crawl(backfill_pages=1)
+        crawler = EveWarCrawler.get_solo()
+        self.assertEqual(crawler.backfill_max_war_id, 5)
+        self.assertFalse(crawler.is_backfill_completed)
+        # when
+        result_2 = self._crawl(backfill_pages=1)
+        # then
+        self.assertListEqual(result_1, [[10, 9, 8], [7, 6, 5]])
+        self.assertListEqual(result_2, [[10, 9, 8], [4, 3, 2]])
+        crawler = EveWarCrawler.get_solo()
+        self.assertEqual(crawler.backfill_max_war_id, 2)
+
+    def test_should_not_advance_high_water_mark_when_interrupted(self, mock_esi):
+        # given
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 11)).get_wars
+        self._crawl()
+        mock_esi.client.Wars.get_wars.side_effect = EsiWarsStub(range(1, 18)).get_wars
+        crawler = EveWarCrawler.get_solo()
+        pages = crawler.crawl()
+        next(pages)
+        pages.close()
+        # when
+        result = self._crawl()
+        # then
+        self.assertListEqual(result, [[17, 16, 15], [14, 13, 12], [11]])
@@ -1,17 +1,28 @@
+import datetime as dt
 from unittest.mock import patch
 
 from django.test import TestCase
+from django.utils.timezone import now
 
 from allianceauth.authentication.models import CharacterOwnership
 from allianceauth.tests.auth_utils import AuthUtils
 from app_utils.testing import NoSocketsTestCase, generate_invalid_pk
 
 from .. import tasks
-from ..models import EveContact, EveEntity, SyncedCharacter, SyncManager
+from ..models import (
+    EveContact,
+    EveEntity,
+    EveFinishedWar,
+    EveWar,
+    EveWarCrawler,
+    SyncedCharacter,
+    SyncManager,
+)
 from . import (
     ALLIANCE_CONTACTS,
     BravadoOperationStub,
     LoadTestDataMixin,
+    create_contact_set,
     create_test_user,
 )
 
@@ -81,9 +92,10 @@ class TestCharacterSync(LoadTestDataMixin, NoSocketsTestCase):
             character_ownership=cls.main_ownership_1,
             version_hash="new",
         )
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in ALLIANCE_CONTACTS:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,
@@ -113,6 +125,7 @@ class TestCharacterSync(LoadTestDataMixin, NoSocketsTestCase):
         self.assertTrue(mock_update.called)
 
 
+@patch(TASKS_PATH + ".delete_obsolete_contact_sets")
 @patch(TASKS_PATH + ".run_character_sync")
 class TestManagerSync(LoadTestDataMixin, TestCase):
     @classmethod
@@ -139,13 +152,18 @@ class TestManagerSync(LoadTestDataMixin, TestCase):
         )
 
     # run for non existing sync manager
-    def test_run_sync_wrong_pk(self, mock_run_character_sync):
+    def test_run_sync_wrong_pk(
+        self, mock_run_character_sync, mock_delete_obsolete_contact_sets
+    ):
         with self.assertRaises(SyncManager.DoesNotExist):
             tasks.run_manager_sync(99999)
 
     @patch(MODELS_PATH + ".SyncManager.update_from_esi")
     def test_should_report_error_when_unexpected_exception_occurs(
-        self, mock_update_from_esi, mock_run_character_sync
+        self,
+        mock_update_from_esi,
+        mock_run_character_sync,
+        mock_delete_obsolete_contact_sets,
     ):
         # given
         mock_update_from_esi.side_effect = RuntimeError
@@ -161,7 +179,10 @@ class TestManagerSync(LoadTestDataMixin, TestCase):
 
     @patch(MODELS_PATH + ".SyncManager.update_from_esi")
     def test_should_normally_run_character_sync(
-        self, mock_update_from_esi, mock_run_character_sync
+        self,
+        mock_update_from_esi,
+        mock_run_character_sync,
+        mock_delete_obsolete_contact_sets,
     ):
         # given
         mock_update_from_esi.return_value = "abc"
@@ -180,6 +201,83 @@ class TestManagerSync(LoadTestDataMixin, TestCase):
         args, kwargs = mock_run_character_sync.delay.call_args
         self.assertEqual(kwargs["sync_char_pk"], synced_character.pk)
         self.assertFalse(kwargs["force_sync"])
+        args, _ = mock_delete_obsolete_contact_sets.delay.call_args
+        self.assertEqual(args[0], sync_manager.pk)
+
+
+class TestDeleteObsoleteContactSets(LoadTestDataMixin, NoSocketsTestCase):
+    @patch(MODELS_PATH + ".SyncManager.delete_obsolete_contact_sets")
+    def test_should_delete_obsolete_contact_sets(self, mock_delete_obsolete):
+        # given
+        user = create_test_user(self.character_1)
+        sync_manager = SyncManager.objects.create(
+            alliance=self.alliance_1,
+            character_ownership=CharacterOwnership.objects.get(
+                character=self.character_1, user=user
+            ),
+        )
+        # when
+        tasks.delete_obsolete_contact_sets(sync_manager.pk)
+        # then
+        self.assertTrue(mock_delete_obsolete.called)
+
+
+class TestDriftAudit(LoadTestDataMixin, NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_1 = create_test_user(cls.character_1)
+        cls.sync_manager = SyncManager.objects.create(
+            alliance=cls.alliance_1,
+            character_ownership=CharacterOwnership.objects.get(
+                character=cls.character_1, user=cls.user_1
+            ),
+        )
+        cls.synced_character_2 = SyncedCharacter.objects.create(
+            character_ownership=CharacterOwnership.objects.create(
+                character=cls.character_2, owner_hash="x2", user=cls.user_1
+            ),
+            manager=cls.sync_manager,
+        )
+
+    @patch(TASKS_PATH + ".audit_character_drift")
+    def test_should_start_audit_for_each_character(self, mock_audit_character_drift):
+        # when
+        tasks.run_drift_audit()
+        # then
+        _, kwargs = mock_audit_character_drift.delay.call_args
+        self.assertEqual(kwargs["sync_char_pk"], self.synced_character_2.pk)
+
+    @patch(TASKS_PATH + ".STANDINGSSYNC_DRIFT_THRESHOLD", 2)
+    @patch(TASKS_PATH + ".run_character_sync")
+    @patch(MODELS_PATH + ".SyncedCharacter.audit_drift")
+    def test_should_start_sync_when_drift_above_threshold(
+        self, mock_audit_drift, mock_run_character_sync
+    ):
+        # given
+        mock_audit_drift.return_value = 3
+        # when
+        result = tasks.audit_character_drift(self.synced_character_2.pk)
+        # then
+        self.assertEqual(result, 3)
+        _, kwargs = mock_run_character_sync.delay.call_args
+        self.assertEqual(kwargs["sync_char_pk"], self.synced_character_2.pk)
+        self.assertTrue(kwargs["force_sync"])
+
+    @patch(TASKS_PATH + ".STANDINGSSYNC_DRIFT_THRESHOLD", 2)
+    @patch(TASKS_PATH + ".run_character_sync")
+    @patch(MODELS_PATH + ".SyncedCharacter.audit_drift")
+    def test_should_not_start_sync_when_drift_within_threshold(
+        self, mock_audit_drift, mock_run_character_sync
+    ):
+        for drift_score in [2, None]:
+            with self.subTest(drift_score=drift_score):
+                # given
+                mock_audit_drift.return_value = drift_score
+                # when
+                tasks.audit_character_drift(self.synced_character_2.pk)
+                # then
+                self.assertFalse(mock_run_character_sync.delay.called)
 
 
 class TestUpdateWars(LoadTestDataMixin, NoSocketsTestCase):
@@ -188,16 +286,77 @@ class TestUpdateWars(LoadTestDataMixin, NoSocketsTestCase):
         super().setUpClass()
 
     @patch(TASKS_PATH + ".update_war")
-    @patch(TASKS_PATH + ".esi")
+    @patch(MODELS_PATH + ".esi")
     def test_should_start_tasks_for_each_war_id(self, mock_esi, mock_update_war):
         # given
-        mock_esi.client.Wars.get_wars.return_value = BravadoOperationStub([1, 2, 3])
+        mock_esi.client.Wars.get_wars.side_effect = (
+            lambda max_war_id=None: BravadoOperationStub(
+                [] if max_war_id else [1, 2, 3]
+            )
+        )
         # when
         tasks.update_all_wars()
         # then
         result = {row[0][0] for row in mock_update_war.delay.call_args_list}
         self.assertSetEqual(result, {1, 2, 3})
 
+    @patch(TASKS_PATH + ".update_war")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_update_known_wars_and_skip_finished_wars(
+        self, mock_esi, mock_update_war
+    ):
+        # given
+        EveWar.objects.create(
+            id=1,
+            aggressor=EveEntity.objects.get(id=3011),
+            defender=EveEntity.objects.get(id=3001),
+            declared=now() - dt.timedelta(days=3),
+            started=now() - dt.timedelta(days=2),
+            is_mutual=False,
+            is_open_for_allies=False,
+        )
+        EveFinishedWar.objects.create(id=2)
+        EveWarCrawler.objects.create(
+            pk=1, high_water_mark=3, is_backfill_completed=True
+        )
+        mock_esi.client.Wars.get_wars.side_effect = (
+            lambda max_war_id=None: BravadoOperationStub([5, 4, 3, 2, 1])
+        )
+        # when
+        tasks.update_all_wars()
+        # then
+        result = [row[0][0] for row in mock_update_war.delay.call_args_list]
+        self.assertListEqual(sorted(result), [1, 3, 4, 5])
+
+    @patch(TASKS_PATH + ".update_war")
+    @patch(MODELS_PATH + ".esi")
+    def test_should_record_finished_wars_when_removing_them(
+        self, mock_esi, mock_update_war
+    ):
+        # given
+        EveWar.objects.create(
+            id=1,
+            aggressor=EveEntity.objects.get(id=3011),
+            defender=EveEntity.objects.get(id=3001),
+            declared=now() - dt.timedelta(days=3),
+            started=now() - dt.timedelta(days=2),
+            finished=now() - dt.timedelta(days=1),
+            is_mutual=False,
+            is_open_for_allies=False,
+        )
+        EveWarCrawler.objects.create(
+            pk=1, high_water_mark=1, is_backfill_completed=True
+        )
+        mock_esi.client.Wars.get_wars.side_effect = (
+            lambda max_war_id=None: BravadoOperationStub([1])
+        )
+        # when
+        tasks.update_all_wars()
+        # then
+        self.assertFalse(EveWar.objects.filter(id=1).exists())
+        self.assertTrue(EveFinishedWar.objects.filter(id=1).exists())
+        self.assertFalse(mock_update_war.delay.called)
+
     @patch(TASKS_PATH + ".EveWar.objects.update_from_esi")
     def test_should_update_war(self, mock_update_from_esi):
         # when
@@ -13,7 +13,7 @@ from app_utils.testing import NoSocketsTestCase
 
 from .. import views
 from ..models import EveContact, EveEntity, SyncedCharacter, SyncManager
-from . import ALLIANCE_CONTACTS, LoadTestDataMixin, create_test_user
+from . import ALLIANCE_CONTACTS, LoadTestDataMixin, create_contact_set, create_test_user
 
 MODULE_PATH = "standingssync.views"
 
@@ -34,9 +34,10 @@ class TestMainScreen(LoadTestDataMixin, TestCase):
             character_ownership=cls.main_ownership_1,
             version_hash="new",
         )
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in ALLIANCE_CONTACTS:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,
@@ -107,9 +108,10 @@ class TestAddSyncChar(LoadTestDataMixin, NoSocketsTestCase):
             character_ownership=cls.main_ownership_1,
             version_hash="new",
         )
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in ALLIANCE_CONTACTS:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,
@@ -247,9 +249,10 @@ class TestAddAllianceManager(LoadTestDataMixin, NoSocketsTestCase):
             character_ownership=cls.main_ownership_1,
             version_hash="new",
         )
+        contact_set = create_contact_set(cls.sync_manager)
         for contact in ALLIANCE_CONTACTS:
             EveContact.objects.create(
-                manager=cls.sync_manager,
+                contact_set=contact_set,
                 eve_entity=EveEntity.objects.get(id=contact["contact_id"]),
                 standing=contact["standing"],
                 is_war_target=False,